@@ -1,19 +1,10 @@
 import streamlit as st
-import cloudscraper
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, unquote
-import logging
-import threading
-import queue
+import asyncio
 import time
-import urllib3
-import ssl
-import re
-from datetime import datetime, date
+from collections import Counter
+from datetime import datetime, timedelta
 import pandas as pd
-import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -21,174 +12,43 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.platypus.flowables import HRFlowable
 from reportlab.lib.enums import TA_CENTER
+from catalog import EventCatalog
+from history import open_history_store
+from parsing import parse_stats, tier_hit_rates
+from pricehistory import PriceHistory
+from records import EventStatus, format_cents
+from resultcache import result_cache
+from scheduler import fair_order, round_robin
+from utils import MAX_WORKERS, ScanBudget, fetch_venue_links, stream_events, stream_events_async
+from venues import load_venues, venue_for_url
 
-# Disable SSL verification warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Streamed results are drawn in batches: redrawing on every row would make large scans quadratic
+STREAM_REDRAW_SECONDS = 0.5
 
-def extract_date_from_url(url):
-    """Extract date from URL with multiple patterns."""
-    decoded_url = unquote(url)
-    patterns = [
-        r'(\d{2})-(\d{2})-(\d{2})',  # mm-dd-yy
-        r'(\d{2})/(\d{2})/(\d{2})',  # mm/dd/yy  
-        r'(\d{2})_(\d{2})_(\d{2})',  # mm_dd_yy
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, decoded_url)
-        if match:
-            try:
-                month, day, year = match.groups()
-                year = f"20{year}"
-                return datetime.strptime(f"{year}-{month}-{day}", "%Y-%m-%d").date()
-            except ValueError:
-                continue
-    return None
+@st.cache_resource
+def load_event_history():
+    """The process-wide history store, shared by every session."""
+    return open_history_store()
 
-def check_single_event(url, event_history, retry_count=0):
-    """Check a single event for ticket availability and pricing with retry logic."""
-    max_retries = 2
-    
-    try:
-        session = cloudscraper.create_scraper(
-            browser={'browser': 'chrome', 'platform': 'windows', 'desktop': True},
-            ssl_context=ssl._create_unverified_context()
-        )
-        delay = 0.7 + (retry_count * 0.5)
-        time.sleep(delay)
-        response = session.get(url, timeout=25, verify=False)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        page_title = soup.title.string if soup.title else ""
-        event_name = soup.title.string.strip() if soup.title else "Untitled"
-        if page_title:
-            title_parts = page_title.split(' - ')
-            if len(title_parts) > 1:
-                for part in title_parts:
-                    part = part.strip()
-                    if not re.match(r'^\d{2}/\d{2}/\d{2}$', part) and 'Handlebar' not in part:
-                        event_name = part
-                        break
-            else:
-                event_name = page_title.split('|')[0].strip()
-        ticket_found = False
-        price = None
-        cart_links = soup.find_all('a', href=re.compile(r'add-to-cart=\d+'))
-        if cart_links:
-            for cart_link in cart_links:
-                parent = cart_link.find_parent('tr')
-                if not parent:
-                    parent = cart_link.find_parent('div', class_=re.compile(r'ticket|price|cart'))
-                if not parent:
-                    parent = cart_link.find_parent('td')
-                if parent:
-                    price_text = parent.get_text()
-                    price_match = re.search(r'\$(\d+\.?\d*)', price_text)
-                    if price_match:
-                        price = price_match.group(0)
-                        ticket_found = True
-                        break
-        if not ticket_found:
-            table_rows = soup.find_all('tr')
-            for row in table_rows:
-                row_text = row.get_text()
-                if 'add to cart' in row_text.lower() or 'plus sales taxes' in row_text.lower():
-                    price_match = re.search(r'\$(\d+\.?\d*)', row_text)
-                    if price_match:
-                        price = price_match.group(0)
-                        ticket_found = True
-                        break
-        if not ticket_found:
-            page_text = soup.get_text()
-            if any(phrase in page_text.lower() for phrase in ['add to cart', 'buy tickets', 'purchase tickets', 'on sale']):
-                price_matches = re.findall(r'\$(\d+\.?\d*)', page_text)
-                if price_matches:
-                    for match in price_matches:
-                        price_val = float(match)
-                        if 5 <= price_val <= 500:
-                            price = f"${match}"
-                            ticket_found = True
-                            break
-        status = "✓ On Sale" if ticket_found else "✗ No Tickets"
-        # Update event history
-        if url not in event_history:
-            event_history[url] = {}
-        current_history = event_history[url].get('price_history', []).copy()
-        if price:
-            current_history.append({
-                'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'price': price
-            })
-        event_history[url].update({
-            'event_name': event_name,
-            'last_checked': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'price_history': current_history,
-            'on_sale': ticket_found
-        })
-        return {
-            'url': url,
-            'event_name': event_name,
-            'price': price or "--",
-            'status': status,
-            'on_sale': ticket_found
-        }
-    except Exception as e:
-        # Retry logic for connection errors
-        if retry_count < max_retries and ('connection' in str(e).lower() or 'remote' in str(e).lower()):
-            return check_single_event(url, event_history, retry_count + 1)
-        error_msg = str(e)
-        if len(error_msg) > 80:
-            error_msg = error_msg[:80] + "..."
-        return {
-            'url': url,
-            'event_name': "Connection Failed",
-            'price': "--",
-            'status': f"⚠ Error",
-            'on_sale': False,
-            'error': True
-        }
+def results_frame(results, catalog):
+    """The results table: display strings for the checked events, in the order given."""
+    return pd.DataFrame([{
+        "Venue": catalog.venue(result.url) or "",
+        "Date": catalog.date_label(result.url),
+        "Event Name": result.event_name,
+        "Price": result.price,
+        "Status": result.status.label,
+        "URL": result.url
+    } for result in results], columns=["Venue", "Date", "Event Name", "Price", "Status", "URL"])
 
-def fetch_links(events_url):
-    """Fetch event links from the main events page."""
-    session = cloudscraper.create_scraper(
-        browser={'browser': 'chrome', 'platform': 'windows', 'desktop': True},
-        ssl_context=ssl._create_unverified_context()
-    )
-    response = session.get(events_url, timeout=15, verify=False)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    event_links = []
-    links = soup.find_all('a', href=True)
-    found_links = set()
-    today = date.today()
-    for link in links:
-        href = link.get('href')
-        text = link.text.strip().lower()
-        if href and href not in found_links and 'hb-events' in href:
-            # Skip common non-event pages
-            skip_patterns = [
-                'contact', 'about', 'policy', 'terms', 
-                'privacy', 'login', 'register', 'cart',
-                'checkout', 'account', 'admin'
-            ]
-            if any(pattern in href.lower() for pattern in skip_patterns):
-                continue
-            full_url = urljoin(events_url, href)
-            found_links.add(href)
-            event_date = extract_date_from_url(full_url)
-            if event_date and event_date < today:
-                continue  # Skip past events
-            # Additional check - skip if URL doesn't look like an event
-            if not re.search(r'\d{2}-\d{2}-\d{2}', href):
-                continue  # Skip if no date pattern in URL
-                
-            event_links.append((full_url, event_date.strftime('%m/%d/%y') if event_date else "TBD"))
-    return event_links
-
-@st.cache_data
-def load_event_history():
-    if os.path.exists('event_history.json'):
-        with open('event_history.json', 'r') as f:
-            return json.load(f)
-    return {}
+def report_event(result, catalog):
+    """A check result as the dict generate_pdf_report reads; 'status' stays an EventStatus."""
+    return {
+        'date': catalog.date_label(result.url),
+        'event_name': result.event_name,
+        'price': result.price,
+        'status': result.status
+    }
 
 def generate_pdf_report(filename, all_events, on_sale_events, total_revenue):
     """Generate a professional PDF report."""
@@ -233,8 +93,8 @@ def generate_pdf_report(filename, all_events, on_sale_events, total_revenue):
 
     total_events = len(all_events)
     on_sale_count = len(on_sale_events)
-    no_tickets = total_events - on_sale_count - sum(1 for e in all_events if 'Error' in e.get('status', ''))
-    error_count = sum(1 for e in all_events if 'Error' in e.get('status', ''))
+    error_count = sum(1 for e in all_events if e['status'] is EventStatus.ERROR)
+    no_tickets = total_events - on_sale_count - error_count
 
     summary_data = [
         ['Metric', 'Count', 'Percentage'],
@@ -295,14 +155,14 @@ def generate_pdf_report(filename, all_events, on_sale_events, total_revenue):
 
     story.append(Paragraph("Complete Event Status Report", heading_style))
     table_data = [['Date', 'Event Name', 'Price', 'Status']]
-    for event in sorted(all_events, key=lambda x: x.get('date', '')):
+    all_events = sorted(all_events, key=lambda x: x.get('date', ''))
+    for event in all_events:
         event_name = event.get('event_name', 'Untitled')[:45] + ('...' if len(event.get('event_name', '')) > 45 else '')
-        status_clean = event.get('status', '--').replace('✓ ', '').replace('✗ ', '').replace('⚠ ', '')
         table_data.append([
             event.get('date', 'TBD'),
             event_name,
             event.get('price', '--'),
-            status_clean
+            event['status'].plain_label
         ])
 
     table = Table(table_data, colWidths=[0.8*inch, 3.5*inch, 0.8*inch, 1*inch])
@@ -321,13 +181,13 @@ def generate_pdf_report(filename, all_events, on_sale_events, total_revenue):
     ]))
 
     for i, event in enumerate(all_events, 1):
-        status = event.get('status', '')
-        if 'On Sale' in status:
+        status = event['status']
+        if status is EventStatus.ON_SALE:
             table.setStyle(TableStyle([
                 ('BACKGROUND', (3, i), (3, i), colors.HexColor('#f0fff4')),
                 ('TEXTCOLOR', (3, i), (3, i), colors.HexColor('#34c759'))
             ]))
-        elif 'Error' in status:
+        elif status is EventStatus.ERROR:
             table.setStyle(TableStyle([
                 ('BACKGROUND', (3, i), (3, i), colors.HexColor('#fffaf0')),
                 ('TEXTCOLOR', (3, i), (3, i), colors.HexColor('#ff9500'))
@@ -364,32 +224,49 @@ def main():
     st.caption("Track ticket availability and pricing for your events")
     
     # Session state for persistent data
-    if 'event_links' not in st.session_state:
-        st.session_state.event_links = []
+    if 'event_catalog' not in st.session_state:
+        st.session_state.event_catalog = EventCatalog()
     if 'event_results' not in st.session_state:
         st.session_state.event_results = []
     if 'event_history' not in st.session_state:
         st.session_state.event_history = load_event_history()
 
     
-    # URL input
-    events_url = st.text_input("Events Page URL", value="https://thehandlebar850.com/events")
+    # Venue selection
+    venues = load_venues()
+    venue_names = st.multiselect("Venues", [venue.name for venue in venues], default=[venue.name for venue in venues])
+    events_url = st.text_input("Other Events Page URL (optional)", value="")
+    max_workers = st.number_input("Concurrent Checks", min_value=1, max_value=16, value=MAX_WORKERS)
+    budget_seconds = st.number_input("Time Budget (seconds, 0 = none)", min_value=0, value=0,
+                                     help="Check the most urgent events first and stop starting new checks after this long.")
+    parse_processes = st.number_input("Parse Processes (0 = parse on the check threads)", min_value=0, max_value=32,
+                                      value=0, help="Parse pages on separate processes so parsing uses every core.")
+    use_async = st.checkbox("Async fetch pipeline", help="Fetch pages from an asyncio event loop; suits scans of hundreds of pages.")
+    force_refresh = st.checkbox("Force refresh", help=f"Fetch every page again, even events checked in the last "
+                                                       f"{result_cache.ttl} seconds by anyone using this dashboard.")
     col1, col2, col3 = st.columns(3)
     
     if col1.button("Fetch Events"):
+        scan_venues = [venue for venue in venues if venue.name in venue_names]
+        if events_url.strip():
+            scan_venues.append(venue_for_url(events_url.strip(), venues))
         with st.spinner("Fetching event links..."):
-            try:
-                st.session_state.event_links = fetch_links(events_url)
-                st.success(f"Found {len(st.session_state.event_links)} upcoming events.")
-            except Exception as e:
-                st.error(f"Error fetching events: {e}")
+            catalog, errors = fetch_venue_links(scan_venues)
+            st.session_state.event_catalog = catalog
+            for name, e in errors.items():
+                st.error(f"Error fetching events for {name}: {e}")
+            if len(errors) < len(scan_venues):
+                st.success(f"Found {len(catalog)} upcoming events at {len(scan_venues) - len(errors)} venue(s).")
     
     # Show event links
-    if st.session_state.event_links:
+    catalog = st.session_state.event_catalog
+    if catalog:
         st.subheader("Upcoming Events")
-        df = pd.DataFrame(st.session_state.event_links, columns=["URL", "Date"])
+        df = pd.DataFrame([(event.venue, event.name, event.url, event.date_label) for event in catalog.events()],
+                          columns=["Venue", "Event", "URL", "Date"])
         df['Select'] = True
-        selected = st.data_editor(df, use_container_width=True, num_rows="dynamic", disabled=["URL", "Date"])
+        selected = st.data_editor(df, use_container_width=True, num_rows="dynamic",
+                                  disabled=["Venue", "Event", "URL", "Date"])
         
         # Check selected events
         if col2.button("Check Selected"):
@@ -399,45 +276,83 @@ def main():
             else:
                 results = []
                 progress = st.progress(0)
-                for i, url in enumerate(selected_urls):
-                    result = check_single_event(url, st.session_state.event_history)
-                    # Save event history after each check
-                    with open('event_history.json', 'w') as f:
-                        json.dump(st.session_state.event_history, f, indent=4)
-                    results.append({
-                        "Date": next((d for u, d in st.session_state.event_links if u == url), "TBD"),
-                        "Event Name": result['event_name'],
-                        "Price": result['price'],
-                        "Status": result['status'],
-                        "URL": url
-                    })
-                    progress.progress((i+1)/len(selected_urls))
+                live_table = st.empty()
+                reused = 0
+                last_drawn = 0.0
+
+                # Venues take turns in the worker pool
+                urls_by_venue = catalog.by_venue(selected_urls)
+                scan_urls = round_robin(list(urls_by_venue.values()))
+                budget = None
+                if budget_seconds:
+                    scan_urls = fair_order(urls_by_venue, st.session_state.event_history)
+                    budget = ScanBudget(seconds=budget_seconds)
+
+                def show_result(result):
+                    """Append a row as soon as its check completes; redraw the table at most every STREAM_REDRAW_SECONDS."""
+                    nonlocal reused, last_drawn
+                    if not result.error:
+                        catalog.set_name(result.url, result.event_name)
+                    results.append(result)
+                    reused += result.cached
+                    progress.progress(len(results)/len(scan_urls), text=f"Checked {len(results)}/{len(scan_urls)} events")
+                    if time.monotonic() - last_drawn >= STREAM_REDRAW_SECONDS:
+                        live_table.dataframe(results_frame(results, catalog), use_container_width=True)
+                        last_drawn = time.monotonic()
+
+                if use_async:
+                    async def stream_async():
+                        async for result in stream_events_async(scan_urls, st.session_state.event_history,
+                                                                budget=budget, refresh=force_refresh,
+                                                                parse_processes=int(parse_processes)):
+                            show_result(result)
+                    asyncio.run(stream_async())
+                else:
+                    for result in stream_events(scan_urls, st.session_state.event_history,
+                                                max_workers=int(max_workers), parse_processes=int(parse_processes),
+                                                budget=budget, refresh=force_refresh):
+                        show_result(result)
+                # Settle the streamed rows into the order the events were selected in
+                position = {url: index for index, url in enumerate(selected_urls)}
+                results.sort(key=lambda result: position[result.url])
+                live_table.empty()
                 st.session_state.event_results = results
-                st.success("Event scan completed.")
+                st.session_state.results_catalog = catalog
+                if len(results) < len(selected_urls):
+                    st.warning(f"Time budget reached: checked the {len(results)} most urgent of "
+                               f"{len(selected_urls)} events.")
+                else:
+                    st.success("Event scan completed.")
+                if reused:
+                    st.caption(f"{reused} of {len(results)} results were checked in the last "
+                               f"{result_cache.ttl} seconds and reused; tick Force refresh to fetch them again.")
+                counts = parse_stats.snapshot()
+                if counts:
+                    st.caption(f"Partial parses: {counts.get('partial', 0)} | "
+                               f"Full-parse fallbacks: {counts.get('fallback', 0)} "
+                               f"({parse_stats.fallback_rate():.0%})")
+                for name, tiers in tier_hit_rates().items():
+                    st.caption(f"Extraction tiers ({name}): " +
+                               " | ".join(f"{tier} {rate:.0%}" for tier, rate in sorted(tiers.items())))
         
         # Show results table
         if st.session_state.event_results:
+            results = st.session_state.event_results
+            results_catalog = st.session_state.get('results_catalog', catalog)
             st.subheader("Event Results")
-            st.dataframe(pd.DataFrame(st.session_state.event_results), use_container_width=True)
+            st.dataframe(results_frame(results, results_catalog), use_container_width=True)
             
             # Status counters
-            total = len(st.session_state.event_results)
-            on_sale = sum(1 for r in st.session_state.event_results if "On Sale" in r["Status"])
-            no_tickets = sum(1 for r in st.session_state.event_results if "No Tickets" in r["Status"])
-            errors = sum(1 for r in st.session_state.event_results if "Error" in r["Status"])
-            st.info(f"Total: {total} | On Sale: {on_sale} | No Tickets: {no_tickets} | Errors: {errors}")
+            counts = Counter(result.status for result in results)
+            st.info(f"Total: {len(results)} | On Sale: {counts[EventStatus.ON_SALE]} | "
+                    f"No Tickets: {counts[EventStatus.NO_TICKETS]} | Errors: {counts[EventStatus.ERROR]}")
             
             # Export PDF
             if col3.button("Export PDF Report"):
-                all_events = st.session_state.event_results
-                on_sale_events = [e for e in all_events if "On Sale" in e["Status"] and e["Price"] != "--"]
-                total_revenue = 0
-                for e in on_sale_events:
-                    try:
-                        price = float(str(e["Price"]).replace("$", "").replace(",", ""))
-                        total_revenue += price
-                    except:
-                        pass
+                all_events = [report_event(result, results_catalog) for result in results]
+                priced = [result for result in results if result.on_sale and result.price_cents is not None]
+                on_sale_events = [report_event(result, results_catalog) for result in priced]
+                total_revenue = sum(result.price_cents for result in priced) / 100
                 # Generate PDF to a temp file
                 import tempfile
                 with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
@@ -447,9 +362,33 @@ def main():
                     st.download_button("Download PDF Report", f, file_name="Event_Report.pdf", mime="application/pdf")
                 os.remove(filename)
     
+    # Price statistics over the whole history (optional)
+    with st.expander("Price History Analytics", expanded=False):
+        days = st.number_input("Last N days (0 = all history)", min_value=0, value=0)
+        if st.checkbox("Compute price statistics"):
+            prices = PriceHistory.from_store(st.session_state.event_history)
+            if days:
+                prices = prices.window(since=datetime.now() - timedelta(days=days))
+            summary = prices.summary()
+            if summary.empty:
+                st.caption("No price observations yet.")
+            else:
+                st.dataframe(pd.DataFrame({
+                    "Min": summary['min_cents'].map(format_cents),
+                    "Max": summary['max_cents'].map(format_cents),
+                    "Last": summary['last_cents'].map(format_cents),
+                    "Price Changes": summary['changes'],
+                    "Observations": summary['observations'],
+                    "First Seen": summary['first_seen'],
+                    "Last Seen": summary['last_seen'],
+                    "Days On Sale": (summary['on_sale_seconds'] / 86400).round(1)
+                }), use_container_width=True)
+                st.caption(f"{len(prices)} price observations of {len(summary)} events.")
+
     # Show event history (optional)
     with st.expander("Show Event History (JSON)", expanded=False):
-        st.json(st.session_state.event_history)
+        if st.checkbox("Load full history"):
+            st.json(st.session_state.event_history.to_dict())
 
 if __name__ == "__main__":
     main()
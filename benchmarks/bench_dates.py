@@ -0,0 +1,132 @@
+"""Benchmark date extraction from event URLs.
+
+Builds a corpus from the event links on the saved listing page, re-dated
+across two years of shows and mixed with the slash/underscore/encoded
+variants and non-event links the scanner also sees, then times the original
+three-pattern extraction against the single-pass pattern in dates.py, cold
+and memoized, and checks that they agree on every URL.
+
+    python benchmarks/bench_dates.py [--size 20000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dates import match_date  # noqa: E402
+from parsing import parse_listing  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+URL_DATE_RE = re.compile(r'\d{2}-\d{2}-\d{2}')
+
+
+def original_extract(url):
+    """extract_date_from_url as it was before dates.py, for comparison."""
+    decoded_url = unquote(url)
+    patterns = [
+        r'(\d{2})-(\d{2})-(\d{2})',  # mm-dd-yy
+        r'(\d{2})/(\d{2})/(\d{2})',  # mm/dd/yy
+        r'(\d{2})_(\d{2})_(\d{2})',  # mm_dd_yy
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, decoded_url)
+        if match:
+            try:
+                month, day, year = match.groups()
+                year = f"20{year}"
+                return datetime.strptime(f"{year}-{month}-{day}", "%Y-%m-%d").date()
+            except ValueError:
+                continue
+    return None
+
+
+def build_corpus(size, seed=0):
+    """``size`` URLs derived from the links on the listing fixture."""
+    with open(os.path.join(FIXTURES, 'listing.html'), 'r', encoding='utf-8') as f:
+        hrefs = [href for href in parse_listing(f.read()).hrefs() if href]
+    events = [href for href in hrefs if URL_DATE_RE.search(href)]
+    others = [href for href in hrefs if not URL_DATE_RE.search(href)]
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    corpus = []
+    while len(corpus) < size:
+        show = start + timedelta(days=rng.randrange(730))
+        stamp = show.strftime('%m-%d-%y')
+        url = URL_DATE_RE.sub(stamp, rng.choice(events), count=1)
+        roll = rng.random()
+        if roll < 0.05:
+            url = url.replace(stamp, stamp.replace('-', '%2F'))
+        elif roll < 0.10:
+            url = url.replace(stamp, stamp.replace('-', '_'))
+        elif roll < 0.12:
+            url = url.replace(stamp, '13-45-26')  # invalid date, falls through to the other kinds
+        elif roll < 0.40:
+            url = rng.choice(others)
+        corpus.append(url)
+    return corpus
+
+
+def timed(function, corpus, repeat):
+    """Best-of-``repeat`` microseconds per URL and the results of the last run."""
+    best = float('inf')
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(url) for url in corpus]
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=20000, help="URLs in the corpus")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per variant, best one is reported")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.size)
+    print(f"{len(corpus)} URLs, {len(set(corpus))} distinct\n")
+
+    def cold(url):
+        match_date.cache_clear()
+        return match_date(url).date
+
+    def listing_filter_original(url):
+        return original_extract(url), bool(URL_DATE_RE.search(url))
+
+    def listing_filter(url):
+        match = match_date(url)
+        return match.date, match.kind == 'dash'
+
+    baseline_us, expected = timed(original_extract, corpus, args.repeat)
+    cold_us, cold_results = timed(cold, corpus, args.repeat)
+    match_date.cache_clear()
+    warm_us, warm_results = timed(lambda url: match_date(url).date, corpus, args.repeat)
+    filter_us, _ = timed(listing_filter_original, corpus, args.repeat)
+    match_date.cache_clear()
+    filter_new_us, _ = timed(listing_filter, corpus, args.repeat)
+
+    print(f"{'variant':<34} {'us/url':>8} {'speedup':>8}")
+    for label, us in [('three patterns (original)', baseline_us),
+                      ('single pass, uncached', cold_us),
+                      ('single pass, memoized', warm_us),
+                      ('date + dash filter (original)', filter_us),
+                      ('date + dash filter (DateMatch)', filter_new_us)]:
+        reference = baseline_us if 'filter' not in label else filter_us
+        print(f"{label:<34} {us:>8.2f} {reference / us:>7.1f}x")
+    print(f"\ncache: {match_date.cache_info()}")
+
+    mismatches = sum(1 for old, new, warm in zip(expected, cold_results, warm_results) if not old == new == warm)
+    if mismatches:
+        print(f"\n{mismatches} URLs extracted differently")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
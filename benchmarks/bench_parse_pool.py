@@ -0,0 +1,71 @@
+"""Benchmark the parse stage on threads against a process pool.
+
+Parses the saved event pages over and over, as a large scan would, once on a
+thread pool (parsing serialized on the GIL, as iter_checks does) and once on
+a process pool fed the raw bytes (as iter_checks_pipelined does), and checks
+that both extract the same results. The gap grows with the number of cores;
+on a single core the process pool can only add its pickling overhead.
+
+    python benchmarks/bench_parse_pool.py [--pages 400] [--workers 4] [--backend html.parser]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import GENERIC_EXTRACTOR, available_backends, parse_event_bytes  # noqa: E402
+from parsepool import parse_process_pool  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_pages(count):
+    """``count`` page bodies, cycling through the event fixtures."""
+    bodies = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'event_*.html'))):
+        with open(path, 'rb') as f:
+            bodies.append(f.read())
+    return [bodies[i % len(bodies)] for i in range(count)]
+
+
+def timed(executor, pages, backend):
+    """Seconds to parse every page on ``executor``, and the extracted infos."""
+    start = time.perf_counter()
+    futures = [executor.submit(parse_event_bytes, body, 'utf-8', GENERIC_EXTRACTOR, backend) for body in pages]
+    infos = [future.result()[0] for future in futures]
+    return time.perf_counter() - start, infos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=400, help="pages to parse per run")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="threads or processes")
+    parser.add_argument('--backend', default='html.parser', choices=available_backends(),
+                        help="parser backend (the pure-Python one shows the GIL best)")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    print(f"{len(pages)} pages, {args.workers} workers, {args.backend}, {os.cpu_count()} cores\n")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        thread_seconds, expected = timed(executor, pages, args.backend)
+    with parse_process_pool(args.workers) as executor:
+        timed(executor, pages[:args.workers], args.backend)  # start the workers outside the timing
+        process_seconds, infos = timed(executor, pages, args.backend)
+
+    print(f"{'stage':<14} {'ms/page':>8} {'speedup':>8}")
+    for label, seconds in [('threads', thread_seconds), ('processes', process_seconds)]:
+        print(f"{label:<14} {seconds / len(pages) * 1000:>8.2f} {thread_seconds / seconds:>7.1f}x")
+
+    if infos != expected:
+        print("\nthreads and processes extracted different results")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
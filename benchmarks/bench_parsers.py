@@ -0,0 +1,89 @@
+"""Benchmark the HTML parser backends on the saved fixture pages.
+
+Reports the per-page parse and extraction time for every backend installed in
+this environment, with and without partial parsing for the BeautifulSoup
+backends, and checks that they all extract the same result. For partial
+parses, building the full tree on fallback counts as extraction time. The
+``json-ld`` mode decodes structured data first and only parses pages without
+it (with the fastest backend), as extract_event_info does.
+
+    python benchmarks/bench_parsers.py [--repeat 50]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import (available_backends, extract_from_document, extract_structured_info,  # noqa: E402
+                     parse_document)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def variants():
+    """(label, backend, partial) for every parsing mode available here."""
+    yield 'json-ld', None, True
+    for backend in available_backends():
+        if backend != 'selectolax':
+            yield f'{backend}/part', backend, True
+        yield backend, backend, False
+
+
+def bench_page(html, backend, partial, repeat):
+    """Return (parse ms, extraction ms, result) averaged over ``repeat`` runs."""
+    parse_time = extract_time = 0.0
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = extract_structured_info(html) if backend is None else None
+        if result is not None:
+            extract_time += time.perf_counter() - start
+            continue
+        doc = parse_document(html, backend, partial)
+        parsed = time.perf_counter()
+        result = extract_from_document(doc)
+        extract_time += time.perf_counter() - parsed
+        parse_time += parsed - start
+    return parse_time / repeat * 1000, extract_time / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50, help="runs per page and backend")
+    args = parser.parse_args()
+
+    pages = sorted(glob.glob(os.path.join(FIXTURES, 'event_*.html')))
+    modes = list(variants())
+    print(f"Backends: {', '.join(available_backends())}  ({args.repeat} runs per page)\n")
+    print(f"{'page':<20} {'backend':<17} {'parse ms':>9} {'extract ms':>11} {'total ms':>9}  result")
+    totals = {label: 0.0 for label, _, _ in modes}
+    mismatches = []
+    for path in pages:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        name = os.path.splitext(os.path.basename(path))[0]
+        results = {}
+        for label, backend, partial in modes:
+            parse_ms, extract_ms, result = bench_page(html, backend, partial, args.repeat)
+            totals[label] += parse_ms + extract_ms
+            results[label] = result
+            print(f"{name:<20} {label:<17} {parse_ms:>9.2f} {extract_ms:>11.2f} {parse_ms + extract_ms:>9.2f}  "
+                  f"{result['price'] or '--'} {'on sale' if result['on_sale'] else 'no tickets'}")
+        if len({(r['event_name'], r['price'], r['on_sale']) for r in results.values()}) > 1:
+            mismatches.append(name)
+
+    print()
+    baseline = totals['html.parser']
+    for label, _, _ in modes:
+        print(f"{label:<17} {totals[label] / len(pages):>8.2f} ms/page  {baseline / totals[label]:>5.1f}x")
+    if mismatches:
+        print(f"\nBackends disagree on: {', '.join(mismatches)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
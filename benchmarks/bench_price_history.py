@@ -0,0 +1,95 @@
+"""Benchmark per-event price statistics over a large history.
+
+Generates months of synthetic price observations for many events, then
+computes min, max and last price, change counts and time on sale for every
+event twice: by walking the ``{'date', 'price'}`` points of each history
+entry as the dict-based history does, and with the columnar PriceHistory in
+pricehistory.py. Checks that both agree.
+
+    python benchmarks/bench_price_history.py [--events 2000] [--observations 250]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricehistory import PriceHistory  # noqa: E402
+from records import parse_cents  # noqa: E402
+from scheduler import parse_timestamp  # noqa: E402
+
+
+def build_history(events, observations, seed=0):
+    """{url: entry} with ``observations`` price points per event over about six months."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    history = {}
+    for index in range(events):
+        price = rng.choice([1500, 2000, 2500, 3500])
+        moment = start + timedelta(minutes=rng.randrange(60 * 24 * 30))
+        points = []
+        for _ in range(observations):
+            if rng.random() < 0.05:
+                price += rng.choice([-500, 500])
+            points.append({'date': moment.strftime('%Y-%m-%d %H:%M:%S'), 'price': f"${price / 100:.2f}"})
+            moment += timedelta(minutes=rng.randrange(10, 1440))
+        history[f"https://example.com/hb-events/show-{index}-12-01-25/"] = {'price_history': points}
+    return history
+
+
+def dict_summary(history):
+    """The statistics from the history dict, one event and one point at a time."""
+    summary = {}
+    for url, entry in history.items():
+        points = entry['price_history']
+        prices = [parse_cents(point['price']) for point in points]
+        first_seen, last_seen = parse_timestamp(points[0]['date']), parse_timestamp(points[-1]['date'])
+        summary[url] = (min(prices), max(prices), prices[-1],
+                        sum(1 for newer, older in zip(prices[1:], prices) if newer != older),
+                        int((last_seen - first_seen).total_seconds()))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--observations', type=int, default=250, help="price observations per event")
+    args = parser.parse_args()
+
+    history = build_history(args.events, args.observations)
+    rows = [(url, point['date'], parse_cents(point['price'])) for url in sorted(history)
+            for point in history[url]['price_history']]  # as the stores' price_rows() return them
+    print(f"{args.events} events, {len(rows)} observations\n")
+
+    start = time.perf_counter()
+    expected = dict_summary(history)
+    dict_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columnar = PriceHistory.from_rows(rows)
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    summary = columnar.summary()
+    summary_seconds = time.perf_counter() - start
+
+    print(f"{'variant':<28} {'ms':>9}")
+    print(f"{'dict walk':<28} {dict_seconds * 1000:>9.1f}")
+    print(f"{'columnar load (once)':<28} {load_seconds * 1000:>9.1f}")
+    print(f"{'columnar summary':<28} {summary_seconds * 1000:>9.1f}")
+    print(f"\nsummary speedup over the dict walk: {dict_seconds / summary_seconds:.0f}x")
+    nbytes = columnar.url.codes.nbytes + columnar.observed_at.nbytes + columnar.price_cents.nbytes
+    print(f"columnar memory: {nbytes / 1e6:.1f} MB")
+
+    actual = {url: (row.min_cents, row.max_cents, row.last_cents, row.changes, row.on_sale_seconds)
+              for url, row in summary.iterrows()}
+    if actual != expected:
+        print("\ncolumnar and dict statistics differ")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
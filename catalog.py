@@ -0,0 +1,87 @@
+"""Indexed catalog of the upcoming events found on the venues' listings.
+
+fetch_links and fetch_venue_links return an EventCatalog: the events in the
+order they were found, indexed by URL, so assembling the results table, the
+CLI output or the report looks up each event's date and venue in constant
+time instead of scanning the list of links.
+"""
+import re
+from urllib.parse import unquote, urlsplit
+
+SLUG_DATE_RE = re.compile(r'\d{2}[-/_]\d{2}[-/_]\d{2}')
+SLUG_SEPARATOR_RE = re.compile(r'[-_+\s]+')
+
+
+def name_from_url(url):
+    """A readable event name from a URL slug: '/hb-events/soul-revue-12-01-26/' -> 'Soul Revue'."""
+    segments = [segment for segment in unquote(urlsplit(url).path).split('/') if segment]
+    if not segments:
+        return None
+    slug = SLUG_DATE_RE.sub('', segments[-1].rsplit('.', 1)[0])
+    words = SLUG_SEPARATOR_RE.sub(' ', slug).strip()
+    return words.title() or None
+
+
+class EventCatalog:
+    """Events by URL, iterated in the order they were added.
+
+    Behaves like a read-only mapping of URL -> EventRecord; the first venue
+    to list a URL keeps it.
+    """
+
+    def __init__(self, events=()):
+        self._events = {}
+        for event in events:
+            self.add(event)
+
+    def add(self, event):
+        """Add ``event`` unless its URL is already cataloged; True if it was added."""
+        if event.url in self._events:
+            return False
+        self._events[event.url] = event
+        return True
+
+    def update(self, other):
+        """Add every event of ``other`` not cataloged yet."""
+        for event in other.events():
+            self.add(event)
+
+    def set_name(self, url, name):
+        """Replace the slug name of ``url`` with the title a check found."""
+        event = self._events.get(url)
+        if event and name and event.name != name:
+            self._events[url] = event._replace(name=name)
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def __contains__(self, url):
+        return url in self._events
+
+    def __getitem__(self, url):
+        return self._events[url]
+
+    def get(self, url, default=None):
+        return self._events.get(url, default)
+
+    def events(self):
+        return self._events.values()
+
+    def date_label(self, url):
+        """The display date of ``url``, TBD for unknown URLs."""
+        event = self._events.get(url)
+        return event.date_label if event else "TBD"
+
+    def venue(self, url):
+        event = self._events.get(url)
+        return event.venue if event else None
+
+    def by_venue(self, urls=None):
+        """{venue name: [url]} of ``urls`` (default: every event), keeping their order."""
+        grouped = {}
+        for url in self._events if urls is None else urls:
+            grouped.setdefault(self.venue(url), []).append(url)
+        return grouped
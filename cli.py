@@ -0,0 +1,202 @@
+"""Headless event scanner for cron and systemd.
+
+Runs the same fetch_links -> stream_events -> history pipeline as the
+Streamlit app, without a browser session or Streamlit's script reruns.
+
+    python cli.py                                                    # one scan of every venue in venues.json
+    python cli.py --url https://thehandlebar850.com/events          # one scan of a single events page
+    python cli.py --daemon --interval 900                            # scan every 15 minutes
+    python cli.py --daemon --adaptive                                # each event on its own cadence
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import sys
+import threading
+from datetime import datetime, timedelta
+
+from catalog import EventCatalog
+from history import HISTORY_BACKEND, open_history_store
+from parsepool import parse_pool
+from parsing import tier_hit_rates
+from scheduler import PollScheduler, fair_order
+from sessions import session_pool
+from utils import (ASYNC_CONCURRENCY, MAX_LISTING_PAGES, MAX_WORKERS, ScanBudget, fetch_venue_links, stream_events,
+                   stream_events_async)
+from venues import VENUES_PATH, load_venues, venue_for_url
+
+log = logging.getLogger('event_monitor')
+
+
+def format_result(result, event_date, venue=None):
+    line = f"{event_date:<9} {result.status.label:<13} {result.price:>8}  {result.event_name}"
+    return f"{venue:<20.20} {line}" if venue else line
+
+
+def select_venues(args):
+    """The venues to scan: ``--url`` alone, or the registry narrowed down by ``--venue``."""
+    venues = load_venues(args.venues)
+    if args.url:
+        return [venue_for_url(args.url, venues)]
+    if args.venue:
+        unknown = set(args.venue) - {venue.name for venue in venues}
+        if unknown:
+            raise ValueError(f"Unknown venue(s) in {args.venues}: {', '.join(sorted(unknown))}")
+        venues = [venue for venue in venues if venue.name in args.venue]
+    return venues
+
+
+def fetch_events(args, venues):
+    """Fetch every venue's events; return (EventCatalog, failed venues)."""
+    catalog, errors = fetch_venue_links(venues, args.max_pages, args.horizon_days, args.discover)
+    if errors and len(errors) == len(venues):
+        raise next(iter(errors.values()))
+    return catalog, len(errors)
+
+
+def check_and_report(args, urls, catalog, history):
+    """Check ``urls`` most urgent first, venues taking turns, printing each result as soon as it is ready.
+
+    Returns the set of URLs that were checked (events skipped once the scan
+    budget ran out are not in it) and the number on sale and failed.
+    """
+    urls = fair_order(catalog.by_venue(urls), history)
+    show_venue = len(catalog.by_venue()) > 1
+    budget = ScanBudget(args.budget_seconds, args.max_requests)
+    checked = set()
+    on_sale = errors = 0
+
+    def report(result):
+        nonlocal on_sale, errors
+        checked.add(result.url)
+        on_sale += result.on_sale
+        errors += result.error
+        event = catalog[result.url]
+        if args.json:
+            print(json.dumps(dict(result.to_dict(), date=event.date_label, venue=event.venue)), flush=True)
+        else:
+            print(format_result(result, event.date_label, event.venue if show_venue else None), flush=True)
+
+    if args.use_async:
+        async def stream():
+            async for result in stream_events_async(urls, history, concurrency=args.concurrency, budget=budget,
+                                                    parse_processes=args.parse_processes):
+                report(result)
+        asyncio.run(stream())
+    else:
+        for result in stream_events(urls, history, max_workers=args.workers, parse_processes=args.parse_processes,
+                                    budget=budget):
+            report(result)
+    if len(checked) < len(urls):
+        log.info("Scan budget used up; %d of %d events left for the next scan", len(urls) - len(checked), len(urls))
+    return checked, on_sale, errors
+
+
+def run_scan(args, history):
+    """Run one scan; return the number of events that could not be checked."""
+    catalog, failed_venues = fetch_events(args, select_venues(args))
+    checked, on_sale, errors = check_and_report(args, list(catalog), catalog, history)
+    log.info("Scan finished: %d checked, %d on sale, %d errors", len(checked), on_sale, errors)
+    for name, tiers in tier_hit_rates().items():
+        log.debug("Extraction tiers for %s: %s", name,
+                  ', '.join(f"{tier} {rate:.0%}" for tier, rate in sorted(tiers.items())))
+    return errors + failed_venues
+
+
+def run_periodic(args, history, stop):
+    """Scan once, or every ``--interval`` seconds with ``--daemon``; return the exit status."""
+    while True:
+        try:
+            status = 1 if run_scan(args, history) else 0
+        except Exception as e:
+            log.error("Scan failed: %s", e)
+            status = 2
+        if not args.daemon or stop.wait(args.interval):
+            return status
+
+
+def run_adaptive(args, history, stop):
+    """Re-check each event when its own poll interval has passed, until stopped.
+
+    The listing pages are re-read every ``--interval`` seconds to pick up new
+    events and drop past ones.
+    """
+    scheduler = PollScheduler(history)
+    catalog = EventCatalog()
+    next_listing = datetime.min
+    while not stop.is_set():
+        if datetime.now() >= next_listing:
+            try:
+                catalog, _ = fetch_events(args, select_venues(args))
+                scheduler.update(catalog)
+                log.info("Tracking %d upcoming events", len(scheduler))
+            except Exception as e:
+                log.error("Listing fetch failed: %s", e)
+            next_listing = datetime.now() + timedelta(seconds=args.interval)
+        due = scheduler.pop_due()
+        if due:
+            log.info("Checking %d due events", len(due))
+            checked, _, _ = check_and_report(args, due, catalog, history)
+            for url in due:
+                if url in checked:
+                    scheduler.reschedule(url)
+                else:
+                    scheduler.requeue(url)  # skipped by the budget: still due
+        wake_at = min(filter(None, [scheduler.next_due(), next_listing]))
+        stop.wait(max(1.0, (wake_at - datetime.now()).total_seconds()))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check event ticket availability without the Streamlit UI.")
+    parser.add_argument('--url', help="scan only this events listing page instead of the configured venues")
+    parser.add_argument('--venues', default=VENUES_PATH, help="venue registry (JSON)")
+    parser.add_argument('--venue', action='append', help="scan only this venue from the registry (repeatable)")
+    parser.add_argument('--max-pages', type=int, default=MAX_LISTING_PAGES,
+                        help="listing pages to crawl (pagination and category pages)")
+    parser.add_argument('--no-discovery', dest='discover', action='store_false',
+                        help="always crawl the HTML listing instead of using the site's sitemaps and feeds")
+    parser.add_argument('--horizon-days', type=int, help="ignore events more than this many days out")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="concurrent checks (thread pool)")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="use the asyncio fetch pipeline")
+    parser.add_argument('--parse-processes', type=int, default=0,
+                        help="parse pages on this many processes while the threads only download (0 = parse on threads)")
+    parser.add_argument('--concurrency', type=int, default=ASYNC_CONCURRENCY, help="in-flight fetches with --async")
+    parser.add_argument('--history-backend', choices=['sqlite', 'jsonl'], default=HISTORY_BACKEND)
+    parser.add_argument('--daemon', action='store_true', help="keep scanning until stopped")
+    parser.add_argument('--interval', type=float, default=900,
+                        help="seconds between scans with --daemon (between listing refreshes with --adaptive)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="with --daemon, poll each event on its own cadence based on its date and price history")
+    parser.add_argument('--budget-seconds', type=float, help="stop starting new checks after this many seconds")
+    parser.add_argument('--max-requests', type=int, help="check at most this many events per scan")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per checked event")
+    parser.add_argument('-v', '--verbose', action='store_true', help="debug logging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s', stream=sys.stderr)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    history = open_history_store(args.history_backend)
+    status = 0
+    try:
+        if args.daemon and args.adaptive:
+            run_adaptive(args, history, stop)
+        else:
+            status = run_periodic(args, history, stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        history.close()
+        session_pool.close()
+        parse_pool.close()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
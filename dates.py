@@ -0,0 +1,67 @@
+"""Event dates embedded in URLs (``/hb-events/artist-07-04-25/``).
+
+One precompiled pattern finds every mm-dd-yy, mm/dd/yy and mm_dd_yy candidate
+in a single pass over the URL. Separators keep their old priority: the first
+dash date wins, then the first slash date, then the first underscore date,
+exactly as the three patterns used to be tried one after the other. The same
+URLs are looked up again and again (listing filters, scan priority, poll
+intervals), so results are memoized.
+"""
+import re
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+from urllib.parse import unquote
+
+# Zero-width so overlapping candidates ('01-02-03/04/05') are all seen
+DATE_RE = re.compile(r'(?=(\d{2})([-/_])(\d{2})\2(\d{2}))')
+KINDS = {'-': 'dash', '/': 'slash', '_': 'underscore'}
+PRIORITY = ['-', '/', '_']
+CACHE_SIZE = 8192
+
+DateMatch = namedtuple('DateMatch', ['date', 'kind'])
+DateMatch.__doc__ = """Date found in a URL (or None) and the kind of its highest-priority candidate.
+
+``kind`` is 'dash', 'slash' or 'underscore' even when that candidate is not
+a valid date, and None when the URL has no candidate at all.
+"""
+
+NO_MATCH = DateMatch(None, None)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def match_date(url):
+    """Find the event date in ``url``; returns a DateMatch."""
+    first = {}
+    for match in DATE_RE.finditer(unquote(url)):
+        separator = match.group(2)
+        if separator in first:
+            continue
+        first[separator] = match
+        if separator == '-' and to_date(match):
+            break  # nothing outranks a valid first dash date
+        if len(first) == len(PRIORITY):
+            break
+    if not first:
+        return NO_MATCH
+    kind = KINDS[next(separator for separator in PRIORITY if separator in first)]
+    for separator in PRIORITY:
+        if separator in first:
+            event_date = to_date(first[separator])
+            if event_date:
+                return DateMatch(event_date, kind)
+    return DateMatch(None, kind)
+
+
+def to_date(match):
+    """The date for a DATE_RE match, or None if it is not a valid mm-dd-yy date."""
+    month, _, day, year = match.groups()
+    try:
+        return date(2000 + int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def extract_date_from_url(url):
+    """Extract date from URL with multiple patterns."""
+    return match_date(url).date
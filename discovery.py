@@ -0,0 +1,216 @@
+"""Event discovery from sitemaps, the WordPress REST API and RSS feeds.
+
+WordPress sites publish their events in small structured documents next to
+the rendered events page: XML sitemaps (WordPress core, Yoast, Rank Math),
+the ``/wp-json/wp/v2`` REST API for custom post types and the archive's RSS
+feed. They are a fraction of the size of the listing page, parse without an
+HTML tree, and carry ``lastmod`` dates: a child sitemap whose ``lastmod`` in
+the index has not moved since the last run is not fetched again at all.
+fetch_links falls back to crawling the HTML listing when none of them are
+available.
+"""
+import logging
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit
+
+from httpcache import http_cache
+from ratelimit import rate_limiter
+from sessions import session_pool
+
+SITEMAP_PATHS = ['/wp-sitemap.xml', '/sitemap_index.xml', '/sitemap.xml']
+REST_TYPES_PATH = '/wp-json/wp/v2/types'
+EVENT_TYPE_RE = re.compile(r'event', re.I)
+MAX_SITEMAPS = 20
+MAX_REST_PAGES = 10
+REST_PAGE_SIZE = 100
+REPROBE_AFTER = 24 * 60 * 60
+
+log = logging.getLogger('event_monitor')
+
+
+def fetch_parsed(url, parse, revalidate=True):
+    """GET ``url`` and return ``parse(response)``, reusing the cached result when unchanged.
+
+    Returns None for error responses. ``parse`` must return a JSON-serializable
+    value, or None when the response is not what was expected.
+    """
+    rate_limiter.acquire(url)
+    with session_pool.session(url) as session:
+        response = session.get(url, timeout=15, verify=False,
+                               headers=http_cache.conditional_headers(url) if revalidate else None)
+    rate_limiter.feedback(url, response)
+    if response.status_code not in (200, 304):
+        return None
+    result, body_hash = http_cache.lookup(url, response)
+    if result is None:
+        if response.status_code == 304:
+            # Nothing usable cached for the validators we sent; fetch the body again
+            return fetch_parsed(url, parse, revalidate=False)
+        result = parse(response)
+        http_cache.store(url, response, result, body_hash)
+    return result
+
+
+def local_name(element):
+    """Tag name without its XML namespace."""
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def child_text(element, name):
+    for child in element:
+        if local_name(child) == name:
+            return (child.text or '').strip() or None
+    return None
+
+
+def parse_sitemap(response):
+    """{'sitemaps': [[loc, lastmod]], 'urls': [[loc, lastmod]]} from a sitemap or sitemap index."""
+    try:
+        root = ET.fromstring(response.content)
+    except ET.ParseError:
+        return None  # an HTML page served at the sitemap URL
+    if local_name(root) not in ('sitemapindex', 'urlset'):
+        return None
+    entries = [[child_text(element, 'loc'), child_text(element, 'lastmod')]
+               for element in root if local_name(element) in ('sitemap', 'url')]
+    entries = [entry for entry in entries if entry[0]]
+    if local_name(root) == 'sitemapindex':
+        return {'sitemaps': entries, 'urls': []}
+    return {'sitemaps': [], 'urls': entries}
+
+
+def parse_rss(response):
+    """{'urls': [[link, pubDate]]} from an RSS 2.0 feed."""
+    try:
+        root = ET.fromstring(response.content)
+    except ET.ParseError:
+        return None
+    if local_name(root) != 'rss':
+        return None
+    return {'urls': [[child_text(item, 'link'), child_text(item, 'pubDate')]
+                     for item in root.iter('item') if child_text(item, 'link')]}
+
+
+def parse_rest_types(response):
+    """{'rest_bases': [...]} of the event-like post types listed by the WP REST API."""
+    try:
+        types = response.json()
+    except ValueError:
+        return None
+    if not isinstance(types, dict):
+        return None
+    rest_bases = [post_type.get('rest_base') or slug for slug, post_type in types.items()
+                  if isinstance(post_type, dict) and EVENT_TYPE_RE.search(slug)]
+    return {'rest_bases': rest_bases}
+
+
+def parse_rest_posts(response):
+    """{'urls': [[link, modified_gmt]], 'total_pages': n} from a WP REST collection."""
+    try:
+        posts = response.json()
+    except ValueError:
+        return None
+    if not isinstance(posts, list):
+        return None
+    return {
+        'urls': [[post['link'], post.get('modified_gmt')] for post in posts
+                 if isinstance(post, dict) and post.get('link')],
+        'total_pages': int(response.headers.get('X-WP-TotalPages') or 1)
+    }
+
+
+class FeedDiscovery:
+    """Find a site's event URLs through its structured feeds.
+
+    Sources are tried cheapest and most complete first: sitemaps, then the
+    REST API, then the archive RSS feed (which WordPress truncates to the
+    latest posts, so it is only used when nothing else is published). The
+    source that worked is remembered per site, and a site without any is not
+    probed again for ``reprobe_after`` seconds.
+    """
+
+    def __init__(self, reprobe_after=REPROBE_AFTER):
+        self.reprobe_after = reprobe_after
+        self._lock = threading.Lock()
+        self._sources = {}
+        self._unavailable = {}
+
+    def discover(self, events_url):
+        """[[url, lastmod]] for the site of ``events_url``, or None if it has no usable feed."""
+        origin = '{0.scheme}://{0.netloc}'.format(urlsplit(events_url))
+        with self._lock:
+            if time.monotonic() - self._unavailable.get(origin, float('-inf')) < self.reprobe_after:
+                return None
+            known = self._sources.get(origin)
+        sources = [('sitemap', self._from_sitemaps), ('rest', self._from_rest), ('rss', self._from_rss)]
+        if known:
+            sources.sort(key=lambda source: source[0] != known)
+        for name, discover in sources:
+            try:
+                urls = discover(origin, events_url)
+            except Exception as e:
+                log.debug("Discovery via %s failed for %s: %s", name, origin, e)
+                continue
+            if urls:
+                with self._lock:
+                    self._sources[origin] = name
+                log.debug("Discovered %d URLs via %s for %s", len(urls), name, origin)
+                return urls
+        with self._lock:
+            self._sources.pop(origin, None)
+            self._unavailable[origin] = time.monotonic()
+        return None
+
+    def _from_sitemaps(self, origin, events_url):
+        for path in SITEMAP_PATHS:
+            sitemap = fetch_parsed(origin + path, parse_sitemap)
+            if sitemap:
+                break
+        else:
+            return None
+        urls = list(sitemap['urls'])
+        children = sitemap['sitemaps']
+        children = [child for child in children if EVENT_TYPE_RE.search(child[0])] or children
+        for loc, lastmod in children[:MAX_SITEMAPS]:
+            child = self._child_sitemap(loc, lastmod)
+            if child:
+                urls.extend(child['urls'])
+        return urls
+
+    def _child_sitemap(self, loc, lastmod):
+        """A child sitemap, skipping the request when its lastmod is unchanged since the last fetch."""
+        entry = http_cache.get(loc)
+        cached = entry.get('result') if entry else None
+        if lastmod and cached and cached.get('lastmod') == lastmod:
+            return cached
+        sitemap = fetch_parsed(loc, parse_sitemap)
+        if sitemap and lastmod and sitemap.get('lastmod') != lastmod:
+            sitemap = dict(sitemap, lastmod=lastmod)
+            http_cache.put(loc, dict(http_cache.get(loc), result=sitemap))
+        return sitemap
+
+    def _from_rest(self, origin, events_url):
+        types = fetch_parsed(origin + REST_TYPES_PATH, parse_rest_types)
+        if not types:
+            return None
+        urls = []
+        for rest_base in types['rest_bases']:
+            for page in range(1, MAX_REST_PAGES + 1):
+                posts = fetch_parsed(f"{origin}/wp-json/wp/v2/{rest_base}?per_page={REST_PAGE_SIZE}"
+                                     f"&page={page}&_fields=link,modified_gmt", parse_rest_posts)
+                if not posts:
+                    break
+                urls.extend(posts['urls'])
+                if page >= posts['total_pages']:
+                    break
+        return urls
+
+    def _from_rss(self, origin, events_url):
+        feed = fetch_parsed(events_url.split('?')[0].rstrip('/') + '/feed/', parse_rss)
+        return feed['urls'] if feed else None
+
+
+discovery = FeedDiscovery()
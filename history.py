@@ -0,0 +1,320 @@
+"""Event history persistence.
+
+Two interchangeable stores are available, both exposing ``record(result)``,
+``get(url)``, ``price_history(url)``, ``price_rows()``, ``to_dict()`` and
+``close()``:
+
+* ``HistoryStore`` keeps the history in memory as the same ``{url: entry}``
+  dict the app has always used, but instead of rewriting
+  ``event_history.json`` after every check each check is appended as one line
+  to ``event_history.jsonl``. The JSON file becomes a snapshot that the log is
+  periodically compacted into.
+* ``SqliteHistoryStore`` keeps events and price observations in SQLite and
+  only reads what is asked for, so startup does not depend on how much
+  history has accumulated. Existing JSON history is migrated on first use,
+  and prices are stored as integer cents next to their display text.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+from records import PriceObservation, format_cents, parse_cents, price_observations
+
+SNAPSHOT_PATH = 'event_history.json'
+LOG_PATH = 'event_history.jsonl'
+DB_PATH = 'event_history.db'
+COMPACT_EVERY = 500
+HISTORY_BACKEND = 'sqlite'
+SCHEMA_VERSION = 2
+
+
+def apply_check(entry, record):
+    """Apply one logged check to a history entry."""
+    entry.setdefault('price_history', [])
+    if record.get('price'):
+        entry['price_history'].append({'date': record['checked_at'], 'price': record['price']})
+    entry['event_name'] = record['event_name']
+    entry['last_checked'] = record['checked_at']
+    entry['on_sale'] = record['on_sale']
+
+
+def load_json_history(snapshot_path=SNAPSHOT_PATH, log_path=LOG_PATH):
+    """Read the JSON snapshot and replay the log; return (events, replayed lines)."""
+    events = {}
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            events = json.load(f)
+    replayed = 0
+    observed = {}  # url -> dates of its price observations, read from the snapshot on first use
+    if os.path.exists(log_path):
+        with open(log_path, 'rb+') as f:
+            data = f.read()
+            # Drop a torn last line so new records start on a line of their own
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn write from a crash
+            entry = events.setdefault(record['url'], {})
+            if record.get('price'):
+                if record['url'] not in observed:
+                    observed[record['url']] = {point['date'] for point in entry.get('price_history', [])}
+                if record['checked_at'] in observed[record['url']]:
+                    continue  # already in the snapshot: a crash came before the log was truncated
+                observed[record['url']].add(record['checked_at'])
+            apply_check(entry, record)
+            replayed += 1
+    return events, replayed
+
+
+def check_record(result):
+    """The part of a CheckResult that is written to the history log."""
+    return {
+        'url': result.url,
+        'event_name': result.event_name,
+        'checked_at': result.checked_at,
+        'on_sale': result.on_sale,
+        'price': format_cents(result.price_cents) if result.price_cents is not None else None
+    }
+
+
+class HistoryStore:
+    """Append-only event history with periodic compaction into a snapshot.
+
+    Every check costs one appended line, however long the price history has
+    grown. After ``compact_every`` appended lines the in-memory history is
+    written to a temporary file, fsynced and atomically renamed over the
+    snapshot, and the log is truncated. Replaying the log skips prices the
+    snapshot already has an observation for at the same time, so a crash
+    between the rename and the truncate does not duplicate price
+    observations, and a torn last line from a crash mid-append is ignored.
+    Checks are not compared by time otherwise: ``checked_at`` is local time,
+    which repeats an hour when the clocks go back.
+    """
+
+    def __init__(self, snapshot_path=SNAPSHOT_PATH, log_path=LOG_PATH, compact_every=COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self.events = self._load()
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+
+    def record(self, result):
+        """Append a successful check result to the history.
+
+        Results served from the result cache were recorded when they were
+        fetched and are skipped.
+        """
+        if result.cached:
+            return
+        record = check_record(result)
+        with self._lock:
+            apply_check(self.events.setdefault(record['url'], {}), record)
+            self._log.write(json.dumps(record) + '\n')
+            self._log.flush()
+            self._appended += 1
+            if self._appended >= self.compact_every:
+                self._compact()
+
+    def get(self, url):
+        """History entry for ``url``, or None."""
+        return self.events.get(url)
+
+    def price_history(self, url, since=None):
+        """[PriceObservation] for ``url``, oldest first, optionally from ``since`` on."""
+        with self._lock:
+            return [observation for observation in price_observations(self.events.get(url))
+                    if since is None or observation.observed_at >= since]
+
+    def price_rows(self):
+        """(url, observed_at, price_cents) of every price observation, by url and then time.
+
+        A history holds few distinct price strings, so each is parsed once.
+        """
+        with self._lock:
+            cents, rows = {}, []
+            for url in sorted(self.events):
+                for point in self.events[url].get('price_history', []):
+                    price = point['price']
+                    if price not in cents:
+                        cents[price] = parse_cents(price)
+                    rows.append((url, point['date'], cents[price]))
+            return rows
+
+    def to_dict(self):
+        """A copy of the full history in the event_history.json format."""
+        with self._lock:
+            return json.loads(json.dumps(self.events))
+
+    def close(self):
+        with self._lock:
+            self._log.close()
+
+    def _load(self):
+        events, self._appended = load_json_history(self.snapshot_path, self.log_path)
+        return events
+
+    def _compact(self):
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.events, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._log.close()
+        self._log = open(self.log_path, 'w', encoding='utf-8')
+        self._appended = 0
+
+
+class SqliteHistoryStore:
+    """Event history in SQLite with an indexed price time series.
+
+    ``events`` holds the latest state per URL and ``price_observations`` one
+    row per observed price, indexed on (url, observed_at) so a single event's
+    series is read without touching the rest. When the database is created
+    and an ``event_history.json`` (plus log) exists, it is imported once.
+    Each observation keeps the '$20.00' text for the JSON format and the
+    price in integer cents; databases from before ``price_cents`` existed
+    (user_version 1) get the column added and filled in on open.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS events (
+            url TEXT PRIMARY KEY,
+            event_name TEXT,
+            last_checked TEXT,
+            on_sale INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS price_observations (
+            url TEXT NOT NULL,
+            observed_at TEXT NOT NULL,
+            price TEXT NOT NULL,
+            price_cents INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_price_observations_url_time
+            ON price_observations (url, observed_at);
+    """
+
+    def __init__(self, db_path=DB_PATH, snapshot_path=SNAPSHOT_PATH, log_path=LOG_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.executescript(self.SCHEMA)
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version == 0:
+            self._migrate(snapshot_path, log_path)
+        elif version == 1:
+            self._add_price_cents()
+
+    def record(self, result):
+        """Store a successful check result; results served from the result cache are skipped."""
+        if result.cached:
+            return
+        record = check_record(result)
+        with self._lock, self._conn:
+            self._upsert(record['url'], record['event_name'], record['checked_at'], record['on_sale'])
+            if record['price']:
+                self._conn.execute('INSERT INTO price_observations (url, observed_at, price, price_cents) '
+                                   'VALUES (?, ?, ?, ?)',
+                                   (record['url'], record['checked_at'], record['price'], result.price_cents))
+
+    def get(self, url):
+        """History entry for ``url`` in the event_history.json format, or None."""
+        with self._lock:
+            row = self._conn.execute('SELECT event_name, last_checked, on_sale FROM events WHERE url = ?',
+                                     (url,)).fetchone()
+            if row is None:
+                return None
+            return self._entry(row, self._price_rows(url))
+
+    def price_history(self, url, since=None):
+        """[PriceObservation] for ``url``, oldest first, optionally from ``since`` on."""
+        with self._lock:
+            return [PriceObservation(observed_at, price_cents)
+                    for observed_at, price_cents in self._price_rows(url, since, 'price_cents')]
+
+    def price_rows(self):
+        """(url, observed_at, price_cents) of every price observation, by url and then time."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT url, observed_at, price_cents FROM price_observations ORDER BY url, observed_at').fetchall()
+
+    def to_dict(self):
+        """The full history in the event_history.json format."""
+        with self._lock:
+            history = {}
+            for url, event_name, last_checked, on_sale in self._conn.execute(
+                    'SELECT url, event_name, last_checked, on_sale FROM events'):
+                history[url] = self._entry((event_name, last_checked, on_sale), [])
+            for url, observed_at, price in self._conn.execute(
+                    'SELECT url, observed_at, price FROM price_observations ORDER BY url, observed_at'):
+                history[url]['price_history'].append({'date': observed_at, 'price': price})
+            return history
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _price_rows(self, url, since=None, column='price'):
+        if since is None:
+            query, params = (f'SELECT observed_at, {column} FROM price_observations '
+                             'WHERE url = ? ORDER BY observed_at'), (url,)
+        else:
+            query, params = (f'SELECT observed_at, {column} FROM price_observations '
+                             'WHERE url = ? AND observed_at >= ? ORDER BY observed_at'), (url, since)
+        return self._conn.execute(query, params).fetchall()
+
+    def _upsert(self, url, event_name, last_checked, on_sale):
+        self._conn.execute(
+            'INSERT INTO events (url, event_name, last_checked, on_sale) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(url) DO UPDATE SET event_name = excluded.event_name, '
+            'last_checked = excluded.last_checked, on_sale = excluded.on_sale',
+            (url, event_name, last_checked, int(bool(on_sale))))
+
+    @staticmethod
+    def _entry(row, price_rows):
+        event_name, last_checked, on_sale = row
+        return {
+            'event_name': event_name,
+            'last_checked': last_checked,
+            'price_history': [{'date': observed_at, 'price': price} for observed_at, price in price_rows],
+            'on_sale': bool(on_sale)
+        }
+
+    def _migrate(self, snapshot_path, log_path):
+        events, _ = load_json_history(snapshot_path, log_path)
+        with self._lock, self._conn:
+            for url, entry in events.items():
+                self._upsert(url, entry.get('event_name'), entry.get('last_checked'), entry.get('on_sale'))
+                self._conn.executemany(
+                    'INSERT INTO price_observations (url, observed_at, price, price_cents) VALUES (?, ?, ?, ?)',
+                    [(url, point['date'], point['price'], parse_cents(point['price']))
+                     for point in entry.get('price_history', [])])
+            self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _add_price_cents(self):
+        """Upgrade a version 1 database: add price_cents, parsed from the price text."""
+        with self._lock, self._conn:
+            self._conn.execute('ALTER TABLE price_observations ADD COLUMN price_cents INTEGER')
+            prices = [price for price, in self._conn.execute('SELECT DISTINCT price FROM price_observations')]
+            self._conn.executemany('UPDATE price_observations SET price_cents = ? WHERE price = ?',
+                                   [(parse_cents(price), price) for price in prices])
+            self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def open_history_store(backend=HISTORY_BACKEND):
+    """Open the configured history store."""
+    if backend == 'sqlite':
+        return SqliteHistoryStore()
+    if backend == 'jsonl':
+        return HistoryStore()
+    raise ValueError(f"Unknown history backend: {backend}")
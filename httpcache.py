@@ -0,0 +1,122 @@
+"""On-disk cache of HTTP validators and parse results for conditional GETs."""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime
+
+CACHE_DIR = '.http_cache'
+
+# Per-request tokens (WordPress nonces, CSRF tokens, CSP nonces) that change on
+# every render of an otherwise identical page
+VOLATILE_PATTERNS = [
+    re.compile(rb'''((?:name|id)=["'][^"']*(?:nonce|csrf|token)[^"']*["'][^>]*?\b(?:value|content)=)(["'])[^"']*\2''', re.I),
+    re.compile(rb'''\b([\w-]*(?:nonce|csrf)[\w-]*["']?\s*[:=]\s*)(["']?)[\w+/=-]+\2''', re.I),
+]
+
+
+def content_hash(body):
+    """Hash a response body with its volatile nonce and CSRF fragments removed."""
+    for pattern in VOLATILE_PATTERNS:
+        body = pattern.sub(rb'\1\2\2', body)
+    return hashlib.sha256(body).hexdigest()
+
+
+class HttpCache:
+    """Remember ``ETag``/``Last-Modified`` and the parse result for each URL.
+
+    The next request for the URL is sent with ``If-None-Match`` /
+    ``If-Modified-Since``; when the server answers 304 the stored parse result
+    is reused instead of downloading and parsing the page again. Servers that
+    ignore conditional requests are caught by comparing a hash of the
+    normalized body with the one stored for the URL. A parse result is only
+    reused by a caller passing the same ``signature`` it was stored with
+    (the extractor's, see parsing.py), so results from an older extraction
+    or another venue configuration are parsed again; until then the stored
+    validators are not sent. Each URL is stored as its own JSON file, written atomically, so the cache survives
+    restarts and a crash never leaves a half-written entry behind.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, url):
+        """Return the stored entry for ``url``, or None."""
+        with self._lock:
+            if url in self._entries:
+                return self._entries[url]
+        entry = None
+        try:
+            with open(self._path(url), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            return self._entries.setdefault(url, entry)
+
+    def conditional_headers(self, url, signature=None):
+        """Validators to send with the next request for ``url``, if its result can be reused."""
+        entry = self.reusable(url, signature)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def reusable(self, url, signature=None):
+        """The stored entry for ``url`` if its result was produced with ``signature``, else None."""
+        entry = self.get(url)
+        return entry if entry and entry.get('signature') == signature else None
+
+    def lookup(self, url, response, signature=None):
+        """Return (cached parse result or None, body hash) for ``response``.
+
+        The cached result is returned when the server answered 304 or when the
+        body hashes to the same value as last time, and it was stored with
+        ``signature``.
+        """
+        entry = self.reusable(url, signature)
+        if response.status_code == 304:
+            return (entry['result'] if entry else None), None
+        body_hash = content_hash(response.content)
+        if entry and entry.get('content_hash') == body_hash:
+            return entry['result'], body_hash
+        return None, body_hash
+
+    def store(self, url, response, result, body_hash=None, signature=None):
+        """Save the response validators and body hash together with its parse result."""
+        self.put(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': body_hash,
+            'stored_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'signature': signature,
+            'result': result
+        })
+
+    def put(self, url, entry):
+        """Replace the entry for ``url`` in memory and on disk."""
+        with self._lock:
+            self._entries[url] = entry
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(url))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+
+http_cache = HttpCache()
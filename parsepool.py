@@ -0,0 +1,78 @@
+"""Process-wide pool of parse worker processes.
+
+Starting the forkserver and its workers costs more than parsing a small
+scan's pages, so a pool is created on first use and reused by every scan
+the process runs with the same number of processes: each Streamlit rerun
+and session, and each CLI daemon cycle. Pools are shut down when the
+interpreter exits.
+"""
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+
+def parse_process_pool(processes):
+    """A process pool for the parse stage (forkserver where available: the scanner is multi-threaded)."""
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    if context.get_start_method() == 'forkserver':
+        context.set_forkserver_preload(['parsing'])
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context)
+
+
+class ParsePool:
+    """Shared parse process pools, one per requested size.
+
+    Scans borrow a pool with ``use()``. A pool stays up while any scan is
+    using it; once another size has been asked for, the old size's pool is
+    shut down as soon as its last scan finishes, so sessions with different
+    settings never pull a pool out from under each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}   # processes -> ProcessPoolExecutor
+        self._users = {}   # processes -> scans using that pool
+        self._current = None
+
+    @contextmanager
+    def use(self, processes):
+        """Borrow the pool with ``processes`` workers for one scan, starting it if needed."""
+        with self._lock:
+            executor = self._pools.get(processes)
+            if executor is None:
+                executor = self._pools[processes] = parse_process_pool(processes)
+            self._users[processes] = self._users.get(processes, 0) + 1
+            self._current = processes
+            retired = self._retire()
+        shutdown(retired)
+        try:
+            yield executor
+        finally:
+            with self._lock:
+                self._users[processes] -= 1
+                retired = self._retire()
+            shutdown(retired)
+
+    def close(self):
+        """Shut every pool down, waiting for their workers to exit."""
+        with self._lock:
+            executors, self._pools = list(self._pools.values()), {}
+        shutdown(executors, wait=True)
+
+    def _retire(self):
+        """Take out the idle pools of sizes other than the last one asked for."""
+        idle = [processes for processes in self._pools
+                if processes != self._current and not self._users.get(processes)]
+        return [self._pools.pop(processes) for processes in idle]
+
+
+def shutdown(executors, wait=False):
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+parse_pool = ParsePool()
+atexit.register(parse_pool.close)
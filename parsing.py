@@ -0,0 +1,534 @@
+"""HTML parser backends and the ticket/price extraction built on top of them.
+
+The extraction only needs a handful of lookups (title, add-to-cart links and
+their containers, table rows, page text, anchors), so every backend exposes
+those through the same small document interface. selectolax and lxml are
+optional C-based parsers that are used when installed; BeautifulSoup with the
+standard library's ``html.parser`` is always available as the fallback.
+
+With BeautifulSoup, event pages are parsed partially by default: only the
+title, table rows and anchors are built into a tree, and the rest of the page
+(scripts, styles, navigation) is skipped unless the extraction has to fall
+back to the whole-page text.
+
+Before any tree is built, ``application/ld+json`` blocks are cut out of the
+raw markup with a regex and decoded: a schema.org ``Event`` (or ``Product``)
+with an ``Offer`` price and availability answers the check without DOM
+parsing at all.
+
+Extraction then runs a list of tiers, each a function from a document to a price or
+None. The generic extractor has three heuristic tiers (cart links, table rows,
+whole-page text); site extractors registered for a host put exact,
+precompiled CSS selectors for that site's ticket markup in front, and can drop
+the whole-page text tier for layouts where it never finds anything real.
+"""
+import html as html_lib
+import json
+import re
+import threading
+from collections import Counter
+from itertools import islice
+from urllib.parse import urlsplit
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401  (only needed so BeautifulSoup can use it)
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+CART_HREF_RE = re.compile(r'add-to-cart=\d+')
+CART_CONTAINER_CLASS_RE = re.compile(r'ticket|price|cart')
+PRICE_RE = re.compile(r'\$(\d+\.?\d*)')
+TITLE_DATE_RE = re.compile(r'^\d{2}/\d{2}/\d{2}$')
+SALE_PHRASES = ['add to cart', 'buy tickets', 'purchase tickets', 'on sale']
+TAG_RE = re.compile(r'<[a-zA-Z/!][^>]*>')
+LD_JSON_RE = re.compile(r'<script[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+                        re.IGNORECASE | re.DOTALL)
+TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.IGNORECASE | re.DOTALL)
+# schema.org ItemAvailability values, without the https://schema.org/ prefix
+AVAILABLE = {'InStock', 'LimitedAvailability', 'OnlineOnly', 'InStoreOnly', 'PreOrder', 'PreSale', 'BackOrder'}
+UNAVAILABLE = {'SoldOut', 'OutOfStock', 'Discontinued'}
+NON_TEXT_TAGS = ['script', 'style', 'template']
+PARTIAL_PARSE = True
+# Bump whenever parsing or extraction changes what is read from an unchanged page, so the
+# results the HTTP cache kept from earlier versions are not reused
+EXTRACTION_VERSION = 1
+EVENT_STRAINER = SoupStrainer(['title', 'tr', 'a'])
+LINK_STRAINER = SoupStrainer('a')
+
+
+class ParseStats:
+    """Thread-safe counters of how event pages were parsed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def increment(self, key, count=1):
+        with self._lock:
+            self._counts[key] += count
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def fallback_rate(self):
+        """Share of partial parses that needed the full tree after all."""
+        counts = self.snapshot()
+        attempts = counts.get('partial', 0) + counts.get('fallback', 0)
+        return counts.get('fallback', 0) / attempts if attempts else 0.0
+
+
+parse_stats = ParseStats()
+tier_stats = ParseStats()
+
+
+class Selector:
+    """A CSS selector compiled once: soupsieve for BeautifulSoup, the text for selectolax."""
+
+    def __init__(self, css):
+        self.css = css
+        self.compiled = soupsieve.compile(css)
+
+    def __repr__(self):
+        return f"Selector({self.css!r})"
+
+
+class SoupDocument:
+    """BeautifulSoup tree built with ``html.parser`` or ``lxml``."""
+
+    def __init__(self, html, features='html.parser', parse_only=None):
+        self.soup = BeautifulSoup(html, features, parse_only=parse_only)
+
+    def title(self):
+        return (self.soup.title.string or "") if self.soup.title else ""
+
+    def cart_link_texts(self):
+        for cart_link in self.soup.find_all('a', href=CART_HREF_RE):
+            parent = cart_link.find_parent('tr')
+            if not parent:
+                parent = cart_link.find_parent('div', class_=CART_CONTAINER_CLASS_RE)
+            if not parent:
+                parent = cart_link.find_parent('td')
+            if parent:
+                yield parent.get_text()
+
+    def row_texts(self):
+        for row in self.soup.find_all('tr'):
+            yield row.get_text()
+
+    def page_text(self):
+        return self.soup.get_text()
+
+    def hrefs(self):
+        return [link.get('href') for link in self.soup.find_all('a', href=True)]
+
+    def select_texts(self, selector):
+        for node in selector.compiled.select(self.soup):
+            yield node.get_text()
+
+
+class PartialSoupDocument(SoupDocument):
+    """BeautifulSoup tree of just the title, table rows and anchors.
+
+    The full tree is only built when a lookup needs content that was not kept:
+    the whole-page text (when the raw markup could satisfy the text tier at
+    all), or the container of a cart link outside any row.
+    """
+
+    def __init__(self, html, features='html.parser'):
+        super().__init__(html, features, parse_only=EVENT_STRAINER)
+        self.html = html
+        self.features = features
+        self.full_document = None
+
+    @property
+    def full_parse(self):
+        return self.full_document is not None
+
+    def cart_link_texts(self):
+        for index, cart_link in enumerate(self.soup.find_all('a', href=CART_HREF_RE)):
+            parent = cart_link.find_parent('tr')
+            if parent is None:
+                # Its div/td container was skipped; the links before this one
+                # were all in rows, so resume at the same link on the full tree
+                yield from islice(self._full().cart_link_texts(), index, None)
+                return
+            yield parent.get_text()
+
+    def page_text(self):
+        if not self._may_have_sale_text():
+            # Neither tier-3 phrase nor price can be on the page; skip the full tree
+            return ""
+        return self._full().page_text()
+
+    def _may_have_sale_text(self):
+        # Tag-stripped, unescaped markup holds every string get_text() can return
+        text = html_lib.unescape(TAG_RE.sub('', self.html)).lower()
+        return '$' in text and any(phrase in text for phrase in SALE_PHRASES)
+
+    def _full(self):
+        if self.full_document is None:
+            self.full_document = SoupDocument(self.html, self.features)
+        return self.full_document
+
+
+class SelectolaxDocument:
+    """selectolax (lexbor) tree; several times faster than BeautifulSoup."""
+
+    def __init__(self, html):
+        self.tree = LexborHTMLParser(html)
+
+    def title(self):
+        node = self.tree.css_first('title')
+        return node.text() if node else ""
+
+    def cart_link_texts(self):
+        for cart_link in self.tree.css('a[href*="add-to-cart="]'):
+            if not CART_HREF_RE.search(cart_link.attributes.get('href') or ''):
+                continue
+            parent = (self._ancestor(cart_link, lambda n: n.tag == 'tr')
+                      or self._ancestor(cart_link, lambda n: n.tag == 'div' and
+                                        CART_CONTAINER_CLASS_RE.search(n.attributes.get('class') or ''))
+                      or self._ancestor(cart_link, lambda n: n.tag == 'td'))
+            if parent:
+                yield parent.text()
+
+    def row_texts(self):
+        for row in self.tree.css('tr'):
+            yield row.text()
+
+    def page_text(self):
+        # Leave out script, style and template contents, as BeautifulSoup's get_text() does
+        self.tree.strip_tags(NON_TEXT_TAGS)
+        return self.tree.root.text() if self.tree.root else ""
+
+    def hrefs(self):
+        return [link.attributes.get('href') for link in self.tree.css('a[href]')]
+
+    def select_texts(self, selector):
+        for node in self.tree.css(selector.css):
+            yield node.text()
+
+    @staticmethod
+    def _ancestor(node, predicate):
+        node = node.parent
+        while node is not None:
+            if predicate(node):
+                return node
+            node = node.parent
+        return None
+
+
+def available_backends():
+    """Parser backends usable in this environment, fastest first."""
+    backends = []
+    if LexborHTMLParser is not None:
+        backends.append('selectolax')
+    if HAS_LXML:
+        backends.append('lxml')
+    backends.append('html.parser')
+    return backends
+
+
+PARSER_BACKEND = available_backends()[0]
+
+
+def parse_document(html, backend=None, partial=PARTIAL_PARSE):
+    """Parse an event page with ``backend`` (default: the fastest one installed)."""
+    backend = backend or PARSER_BACKEND
+    if backend == 'selectolax':
+        return SelectolaxDocument(html)
+    if backend in ('lxml', 'html.parser'):
+        return PartialSoupDocument(html, backend) if partial else SoupDocument(html, backend)
+    raise ValueError(f"Unknown parser backend: {backend}")
+
+
+def parse_listing(html, backend=None):
+    """Parse a listing page; only its anchors are needed."""
+    backend = backend or PARSER_BACKEND
+    if backend == 'selectolax':
+        return SelectolaxDocument(html)
+    return SoupDocument(html, backend, parse_only=LINK_STRAINER)
+
+
+def event_name_from_title(page_title):
+    """Pick the event name out of a page title like 'Artist - 07/04/25 - Handlebar'."""
+    if not page_title:
+        return "Untitled"
+    event_name = page_title.strip()
+    title_parts = page_title.split(' - ')
+    if len(title_parts) > 1:
+        for part in title_parts:
+            part = part.strip()
+            if not TITLE_DATE_RE.match(part) and 'Handlebar' not in part:
+                event_name = part
+                break
+    else:
+        event_name = page_title.split('|')[0].strip()
+    return event_name
+
+
+def cart_price(doc):
+    """Tier 1: the price next to an add-to-cart link."""
+    for price_text in doc.cart_link_texts():
+        price_match = PRICE_RE.search(price_text)
+        if price_match:
+            return price_match.group(0)
+    return None
+
+
+def row_price(doc):
+    """Tier 2: the price in a table row that offers tickets."""
+    for row_text in doc.row_texts():
+        if 'add to cart' in row_text.lower() or 'plus sales taxes' in row_text.lower():
+            price_match = PRICE_RE.search(row_text)
+            if price_match:
+                return price_match.group(0)
+    return None
+
+
+def text_price(doc):
+    """Tier 3: a plausible price anywhere on a page that mentions a sale."""
+    page_text = doc.page_text()
+    if any(phrase in page_text.lower() for phrase in SALE_PHRASES):
+        for match in PRICE_RE.findall(page_text):
+            if 5 <= float(match) <= 500:
+                return f"${match}"
+    return None
+
+
+def ld_json_items(html):
+    """Every JSON object in the page's ld+json blocks, with @graph and nested lists flattened."""
+    pending = []
+    for block in LD_JSON_RE.findall(html):
+        try:
+            pending.append(json.loads(block))
+        except ValueError:
+            continue  # broken JSON-LD is common; the DOM tiers will handle the page
+    while pending:
+        item = pending.pop(0)
+        if isinstance(item, list):
+            pending.extend(item)
+        elif isinstance(item, dict):
+            yield item
+            if isinstance(item.get('@graph'), list):
+                pending.extend(item['@graph'])
+
+
+def schema_types(item):
+    types = item.get('@type') or []
+    return [types] if isinstance(types, str) else [t for t in types if isinstance(t, str)]
+
+
+def offer_price(offer):
+    """The offer's price as '$20.00'-style text, or None."""
+    price = offer.get('price', offer.get('lowPrice'))
+    if isinstance(price, bool) or price is None:
+        return None
+    if isinstance(price, (int, float)):
+        return f"${price:g}" if price == int(price) else f"${price:.2f}"
+    price_match = PRICE_RE.match('$' + str(price).strip().lstrip('$').replace(',', ''))
+    return price_match.group(0) if price_match else None
+
+
+def structured_offer(item):
+    """(price, on_sale) from an Event/Product's offers, or None when they say nothing usable."""
+    offers = item.get('offers')
+    offers = offers if isinstance(offers, list) else [offers]
+    offers = [offer for offer in offers if isinstance(offer, dict)]
+    sold_out = False
+    for offer in offers:
+        availability = str(offer.get('availability') or '').rsplit('/', 1)[-1]
+        if availability in UNAVAILABLE:
+            sold_out = True
+        elif availability in AVAILABLE:
+            price = offer_price(offer)
+            if price:
+                return price, True
+    return (None, False) if sold_out else None
+
+
+def extract_structured_info(html):
+    """Extract the event name, price and availability from JSON-LD, or None if the page has none usable."""
+    if 'application/ld+json' not in html:
+        return None
+    for item in ld_json_items(html):
+        if not any(t.endswith('Event') or t == 'Product' for t in schema_types(item)):
+            continue
+        offer = structured_offer(item)
+        if offer is None:
+            continue
+        title_match = TITLE_RE.search(html)
+        page_title = html_lib.unescape(title_match.group(1)) if title_match else ""
+        price, on_sale = offer
+        return {'event_name': event_name_from_title(page_title), 'price': price, 'on_sale': on_sale}
+    return None
+
+
+class Extractor:
+    """Ticket and price extraction as an ordered list of (tier name, price function).
+
+    The generic extractor only has the heuristic tiers. Subclasses add exact
+    tiers in front through exact_tiers(); with ``text_fallback=False`` the
+    whole-page text tier is dropped. ``partial=False`` asks for a full tree
+    when the exact tiers need markup outside the title, rows and anchors that
+    a partial BeautifulSoup parse keeps. ``structured=False`` skips the
+    JSON-LD fast path for sites whose structured data cannot be trusted.
+    """
+
+    def __init__(self, name='generic', text_fallback=True, partial=True, structured=True):
+        self.name = name
+        self.partial = partial
+        self.structured = structured
+        self.tiers = self.exact_tiers() + [('cart', cart_price), ('row', row_price)]
+        if text_fallback:
+            self.tiers.append(('text', text_price))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+    @property
+    def signature(self):
+        """What this extractor reads from a page depends on, for the HTTP cache to match."""
+        tiers = ','.join(tier for tier, _ in self.tiers)
+        return (f"{EXTRACTION_VERSION}:{PARSER_BACKEND}:{self.name}:{tiers}:"
+                f"partial={self.partial}:structured={self.structured}")
+
+    def exact_tiers(self):
+        return []
+
+    def extract(self, doc):
+        """Return (info, name of the tier that found the price or 'none')."""
+        event_name = event_name_from_title(doc.title())
+        for tier, find_price in self.tiers:
+            price = find_price(doc)
+            if price:
+                return {'event_name': event_name, 'price': price, 'on_sale': True}, tier
+        return {'event_name': event_name, 'price': None, 'on_sale': False}, 'none'
+
+
+class SelectorExtractor(Extractor):
+    """Extractor for a known layout: a price inside any node matched by ``ticket_selectors``.
+
+    The selectors should match the element of an offer that can be bought,
+    e.g. ``tr:has(a[href*="add-to-cart="])``.
+    """
+
+    def __init__(self, name, ticket_selectors, text_fallback=True, partial=True, structured=True):
+        self.selectors = [Selector(css) for css in ticket_selectors]
+        super().__init__(name, text_fallback, partial, structured)
+
+    @property
+    def signature(self):
+        return super().signature + ':' + '|'.join(selector.css for selector in self.selectors)
+
+    def exact_tiers(self):
+        return [('selector', self.selector_price)]
+
+    def selector_price(self, doc):
+        for selector in self.selectors:
+            for text in doc.select_texts(selector):
+                price_match = PRICE_RE.search(text)
+                if price_match:
+                    return price_match.group(0)
+        return None
+
+
+GENERIC_EXTRACTOR = Extractor()
+
+
+class ExtractorRegistry:
+    """Site extractors by host name; hosts without one use the generic extractor."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._extractors = {}
+
+    def register(self, extractor, *hosts):
+        with self._lock:
+            for host in hosts:
+                self._extractors[host.lower()] = extractor
+
+    def for_url(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        with self._lock:
+            return (self._extractors.get(host) or self._extractors.get(host[4:] if host.startswith('www.') else None)
+                    or GENERIC_EXTRACTOR)
+
+
+extractors = ExtractorRegistry()
+# The Handlebar's WooCommerce ticket table: one row per ticket type with an add-to-cart button
+extractors.register(SelectorExtractor('handlebar', ['tr:has(a[href*="add-to-cart="])']), 'thehandlebar850.com')
+
+
+def extract_from_document(doc, extractor=GENERIC_EXTRACTOR):
+    """Extract the event name, price and availability from a parsed page."""
+    return extractor.extract(doc)[0]
+
+
+def extract_event_fields(html, backend=None, partial=PARTIAL_PARSE, extractor=GENERIC_EXTRACTOR):
+    """Extract the event name, price and availability; return (info, counter keys).
+
+    Nothing is counted here, so this can run in a parse worker process; the
+    keys go back to the parent and are passed to record_parse_stats().
+    JSON-LD offers are used when the page has them; otherwise the page is
+    parsed and the extractor's tiers run.
+    """
+    if extractor.structured:
+        info = extract_structured_info(html)
+        if info is not None:
+            return info, [('tier', f'{extractor.name}/jsonld')]
+    doc = parse_document(html, backend, partial and extractor.partial)
+    info, tier = extractor.extract(doc)
+    keys = [('tier', f'{extractor.name}/{tier}')]
+    if isinstance(doc, PartialSoupDocument):
+        keys.append(('parse', 'fallback' if doc.full_parse else 'partial'))
+    return info, keys
+
+
+def record_parse_stats(keys):
+    """Count the keys returned by extract_event_fields in this process's counters."""
+    for counter, key in keys:
+        (tier_stats if counter == 'tier' else parse_stats).increment(key)
+
+
+def extract_event_info(html, backend=None, partial=PARTIAL_PARSE, extractor=GENERIC_EXTRACTOR):
+    """Extract the event name, price and availability from an event page."""
+    info, keys = extract_event_fields(html, backend, partial, extractor)
+    record_parse_stats(keys)
+    return info
+
+
+def parse_event_bytes(content, encoding, extractor=GENERIC_EXTRACTOR, backend=None):
+    """Decode a downloaded event page and extract it, for parse worker processes.
+
+    Decoding happens here rather than in the downloading thread because it
+    is CPU work too. Returns extract_event_fields()'s (info, counter keys).
+    """
+    try:
+        html = content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        html = content.decode('utf-8', errors='replace')
+    return extract_event_fields(html, backend, extractor=extractor)
+
+
+def tier_hit_rates():
+    """{extractor name: {tier: share of its pages}} from the tier counters."""
+    rates = {}
+    for key, count in tier_stats.snapshot().items():
+        name, tier = key.split('/', 1)
+        rates.setdefault(name, {})[tier] = count
+    for tiers in rates.values():
+        total = sum(tiers.values())
+        for tier in tiers:
+            tiers[tier] /= total
+    return rates
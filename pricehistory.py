@@ -0,0 +1,99 @@
+"""Columnar price history for analytics over every event at once.
+
+The history stores are organized for looking up one event at a time, which
+means one Python object per observation for any question about all of them.
+PriceHistory loads every observation once, from the stores' ``price_rows()``
+(already in integer cents), into three columns:
+
+* ``url``: a pandas Categorical, so each observation holds a small code
+* ``observed_at``: int64 seconds since the epoch
+* ``price_cents``: int64
+
+sorted by event and time. Per-event statistics (min, max, last price, number
+of price changes, time seen on sale) are then computed with NumPy reductions
+over contiguous slices, without a Python loop over events or observations.
+"""
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class PriceHistory:
+    """Every price observation as columns sorted by event, then time."""
+
+    def __init__(self, url, observed_at, price_cents):
+        order = np.lexsort((observed_at, url.codes))
+        self.url = url[order]
+        self.observed_at = observed_at[order]
+        self.price_cents = price_cents[order]
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From (url, 'YYYY-mm-dd HH:MM:SS', price_cents) rows; rows without a price or time are dropped."""
+        rows = list(rows)
+        urls = pd.Series([row[0] for row in rows], dtype=object)
+        times = to_timestamps([row[1] for row in rows])
+        cents = pd.Series([row[2] for row in rows], dtype='Int64')
+        valid = cents.notna().to_numpy() & ~np.isnat(times)
+        return cls(pd.Categorical(urls[valid]), times[valid].astype(np.int64),
+                   cents[valid].to_numpy(dtype=np.int64))
+
+    @classmethod
+    def from_store(cls, store):
+        """Load the price observations of a history store (see history.py)."""
+        return cls.from_rows(store.price_rows())
+
+    def __len__(self):
+        return len(self.price_cents)
+
+    def window(self, since=None, until=None):
+        """The observations from ``since`` up to ``until`` (datetimes, both optional)."""
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.observed_at >= to_seconds(since)
+        if until is not None:
+            mask &= self.observed_at <= to_seconds(until)
+        return PriceHistory(self.url[mask], self.observed_at[mask], self.price_cents[mask])
+
+    def summary(self):
+        """Per-event statistics, one row per URL.
+
+        Columns: observations, min_cents, max_cents, last_cents, changes (times
+        the price differed from the previous observation), first_seen and
+        last_seen (datetime64), and on_sale_seconds between them.
+        """
+        columns = ['observations', 'min_cents', 'max_cents', 'last_cents', 'changes',
+                   'first_seen', 'last_seen', 'on_sale_seconds']
+        if not len(self):
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='url'))
+        codes = self.url.codes
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)]
+        prices, times = self.price_cents, self.observed_at
+        changed = np.r_[False, (prices[1:] != prices[:-1]) & (codes[1:] == codes[:-1])]
+        first_seen, last_seen = times[starts], times[ends - 1]
+        return pd.DataFrame({
+            'observations': ends - starts,
+            'min_cents': np.minimum.reduceat(prices, starts),
+            'max_cents': np.maximum.reduceat(prices, starts),
+            'last_cents': prices[ends - 1],
+            'changes': np.add.reduceat(changed.astype(np.int64), starts),
+            'first_seen': first_seen.astype('datetime64[s]'),
+            'last_seen': last_seen.astype('datetime64[s]'),
+            'on_sale_seconds': last_seen - first_seen
+        }, index=pd.Index(self.url.categories[codes[starts]], name='url'), columns=columns)
+
+
+def to_timestamps(texts):
+    """'YYYY-mm-dd HH:MM:SS' strings as datetime64[s], NaT where they are not valid."""
+    try:
+        return np.array(texts, dtype='datetime64[s]')
+    except ValueError:
+        return pd.to_datetime(pd.Series(texts, dtype=object), format=TIMESTAMP_FORMAT,
+                              errors='coerce').to_numpy().astype('datetime64[s]')
+
+
+def to_seconds(moment):
+    """A datetime as int64 seconds since the epoch, on the same naive clock as the history."""
+    return int(np.datetime64(moment, 's').astype(np.int64))
@@ -0,0 +1,135 @@
+"""Adaptive per-host rate limiting shared by every scan worker."""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+CHALLENGE_MARKERS = ('cf-chl', 'challenge-platform', '<title>Just a moment')
+
+
+MAX_BLOCKED_WAIT = 30.0
+
+
+class RateLimitedError(ConnectionError):
+    """Raised when the remote host answered with a throttling response."""
+
+
+class HostBlockedError(Exception):
+    """Raised instead of waiting when a host asked us to stay away for longer than we wait."""
+
+
+def is_challenge(response):
+    """Detect a Cloudflare challenge page that cloudscraper could not solve."""
+    if response.headers.get('cf-mitigated', '').lower() == 'challenge':
+        return True
+    if response.status_code in (403, 503):
+        head = response.text[:4096]
+        return any(marker in head for marker in CHALLENGE_MARKERS)
+    return False
+
+
+def parse_retry_after(value):
+    """Return the number of seconds a ``Retry-After`` header asks us to wait."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class _Bucket:
+    __slots__ = ('rate', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+
+class AdaptiveRateLimiter:
+    """Token bucket per host whose refill rate follows the host's health.
+
+    Every healthy response raises the rate by ``increase`` requests/second up
+    to ``max_rate``; throttling responses (429/503), unsolved challenges and
+    connection errors multiply it by ``backoff`` down to ``min_rate``. A
+    ``Retry-After`` header blocks the host entirely until it has passed, but
+    no request waits more than ``max_blocked_wait`` seconds for that: while
+    the host is blocked for longer, requests to it fail with HostBlockedError
+    instead of tying up a worker.
+    """
+
+    def __init__(self, rate=2.0, burst=4, min_rate=0.2, max_rate=10.0, increase=0.25, backoff=0.5,
+                 max_blocked_wait=MAX_BLOCKED_WAIT):
+        self.initial_rate = rate
+        self.max_blocked_wait = max_blocked_wait
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def reserve(self, url):
+        """Take a token for ``url``'s host and return how long to wait before using it.
+
+        Raises HostBlockedError without taking a token when the host is blocked
+        for more than ``max_blocked_wait`` seconds.
+        """
+        with self._lock:
+            bucket = self._bucket(url)
+            now = time.monotonic()
+            if bucket.blocked_until - now > self.max_blocked_wait:
+                raise HostBlockedError(f"{urlsplit(url).netloc} asked to retry in "
+                                       f"{bucket.blocked_until - now:.0f}s")
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            bucket.tokens -= 1
+            # A negative balance is the queue of requests already promised a later slot
+            wait = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            return max(wait, bucket.blocked_until - now)
+
+    def acquire(self, url):
+        """Block the calling thread until a request to ``url``'s host is allowed."""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def feedback(self, url, response):
+        """Adjust the host's rate from a response and raise if it was throttled."""
+        throttled = response.status_code in (429, 503) or is_challenge(response)
+        with self._lock:
+            bucket = self._bucket(url)
+            if not throttled:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+                return
+            bucket.rate = max(self.min_rate, bucket.rate * self.backoff)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after:
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after)
+        raise RateLimitedError(f"remote host throttled request ({response.status_code})")
+
+    def penalize(self, url):
+        """Back off after a connection error."""
+        with self._lock:
+            bucket = self._bucket(url)
+            bucket.rate = max(self.min_rate, bucket.rate * self.backoff)
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.initial_rate, self.burst)
+        return bucket
+
+
+rate_limiter = AdaptiveRateLimiter()
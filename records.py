@@ -0,0 +1,163 @@
+"""Typed records for events, check results and price observations.
+
+Prices are integer cents and availability an EventStatus everywhere inside
+the scanner; the '$20.00' and '✓ On Sale' strings only exist at the edges:
+the page text a price is read from, the history files, the CLI output, the
+app's tables and the PDF report.
+"""
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+
+
+class EventStatus(Enum):
+    """Availability found by a check; the value is the label shown to users."""
+    ON_SALE = "✓ On Sale"
+    NO_TICKETS = "✗ No Tickets"
+    ERROR = "⚠ Error"
+
+    @property
+    def label(self):
+        return self.value
+
+    @property
+    def plain_label(self):
+        """The label without its symbol, for the PDF fonts."""
+        return self.value.split(' ', 1)[1]
+
+
+def parse_cents(text):
+    """'$1,234.5' -> 123450; None for missing or unparseable prices."""
+    if not text:
+        return None
+    try:
+        amount = Decimal(str(text).strip().lstrip('$').replace(',', ''))
+    except InvalidOperation:
+        return None
+    return int((amount * 100).to_integral_value()) if amount.is_finite() else None
+
+
+def format_cents(cents):
+    """123450 -> '$1,234.50'; '--' when there is no price."""
+    if cents is None:
+        return "--"
+    return f"${cents // 100:,}.{cents % 100:02d}"
+
+
+class EventRecord(namedtuple('EventRecord', ['url', 'date', 'venue', 'name', 'source', 'updated'])):
+    """One upcoming event: its page, date (or None), venue name and where it was found.
+
+    ``name`` is taken from the URL slug until a check reports the page's own
+    title. ``source`` is 'listing' for links crawled from the events pages and
+    'feed' for URLs from a sitemap, the REST API or RSS, whose last-modified
+    time is kept in ``updated``.
+    """
+    __slots__ = ()
+
+    @property
+    def date_label(self):
+        """The date as shown in tables and reports: mm/dd/yy, or TBD."""
+        return self.date.strftime('%m/%d/%y') if self.date else "TBD"
+
+
+class CheckResult:
+    """The outcome of checking one event page.
+
+    ``checked_at`` is None for failed checks, ``cached`` is set on copies
+    served from the result cache.
+    """
+    __slots__ = ('url', 'event_name', 'price_cents', 'status', 'checked_at', 'cached')
+
+    def __init__(self, url, event_name, price_cents, status, checked_at=None, cached=False):
+        self.url = url
+        self.event_name = event_name
+        self.price_cents = price_cents
+        self.status = status
+        self.checked_at = checked_at
+        self.cached = cached
+
+    @classmethod
+    def from_info(cls, url, info):
+        """The result for a page whose extracted info is ``info``."""
+        return cls(url, info['event_name'], parse_cents(info['price']),
+                   EventStatus.ON_SALE if info['on_sale'] else EventStatus.NO_TICKETS,
+                   datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    @classmethod
+    def failed(cls, url):
+        """The result for a page that could not be fetched or parsed."""
+        return cls(url, "Connection Failed", None, EventStatus.ERROR)
+
+    def __repr__(self):
+        return f"CheckResult({self.url!r}, {self.status.name}, {self.price})"
+
+    def __eq__(self, other):
+        if not isinstance(other, CheckResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    @property
+    def on_sale(self):
+        return self.status is EventStatus.ON_SALE
+
+    @property
+    def error(self):
+        return self.status is EventStatus.ERROR
+
+    @property
+    def price(self):
+        """The price as shown to users: '$20.00', or '--'."""
+        return format_cents(self.price_cents)
+
+    def as_cached(self):
+        """A copy marked as served from the result cache."""
+        return CheckResult(self.url, self.event_name, self.price_cents, self.status, self.checked_at, True)
+
+    def to_dict(self):
+        """The result in the JSON format of ``cli.py --json``."""
+        result = {
+            'url': self.url,
+            'event_name': self.event_name,
+            'price': self.price,
+            'price_cents': self.price_cents,
+            'status': self.status.label,
+            'on_sale': self.on_sale
+        }
+        if self.checked_at:
+            result['checked_at'] = self.checked_at
+        if self.error:
+            result['error'] = True
+        if self.cached:
+            result['cached'] = True
+        return result
+
+
+class PriceObservation:
+    """A price seen by one check, as stored in an event's price history."""
+    __slots__ = ('observed_at', 'price_cents')
+
+    def __init__(self, observed_at, price_cents):
+        self.observed_at = observed_at
+        self.price_cents = price_cents
+
+    @classmethod
+    def from_point(cls, point):
+        """From a ``{'date': ..., 'price': '$20.00'}`` history point."""
+        return cls(point['date'], parse_cents(point['price']))
+
+    def to_point(self):
+        return {'date': self.observed_at, 'price': format_cents(self.price_cents)}
+
+    def __repr__(self):
+        return f"PriceObservation({self.observed_at!r}, {self.price_cents})"
+
+    def __eq__(self, other):
+        if not isinstance(other, PriceObservation):
+            return NotImplemented
+        return (self.observed_at, self.price_cents) == (other.observed_at, other.price_cents)
+
+
+def price_observations(entry):
+    """The PriceObservations in a history entry, oldest first."""
+    return [PriceObservation.from_point(point) for point in (entry or {}).get('price_history') or []]
@@ -0,0 +1,105 @@
+"""Process-wide cache of recent check results.
+
+Streamlit serves every session from one process, so everyone watching the
+dashboard shares this cache: checking an event that was checked less than
+``ttl`` seconds ago returns the earlier result instead of fetching the page
+again, and concurrent checks of the same event wait for one fetch instead of
+each sending their own request.
+"""
+import threading
+import time
+
+RESULT_TTL = 120
+
+
+class ResultCache:
+    """Check results by URL, fresh for ``ttl`` seconds, with single-flight fetching.
+
+    Results served from the cache are copies marked ``cached`` that keep
+    their original ``checked_at``. Error results are never cached.
+    """
+
+    def __init__(self, ttl=RESULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._results = {}
+        self._inflight = {}
+
+    def get(self, url):
+        """The cached result for ``url`` if it is still fresh, else None."""
+        with self._lock:
+            return self._fresh(url)
+
+    def put(self, url, result):
+        if result.error:
+            return
+        with self._lock:
+            self._results[url] = (time.monotonic(), result)
+
+    def get_or_fetch(self, url, fetch, refresh=False):
+        """Return a fresh cached result for ``url`` or ``fetch(url)`` it.
+
+        With ``refresh`` the cached result is ignored, but a fetch of the same
+        URL already in progress is still waited for and shared.
+        """
+        cached = self.claim(url, refresh)
+        if cached:
+            return cached
+        result = None
+        try:
+            result = fetch(url)
+            return result
+        finally:
+            self.finish(url, result)
+
+    def claim(self, url, refresh=False):
+        """Wait until there is a fresh result for ``url`` to share (returned) or the caller owns its fetch (None).
+
+        An owned fetch must be handed to finish(), as with begin().
+        """
+        while True:
+            cached, done = self.begin(url, refresh)
+            if cached or done is None:
+                return cached
+            done.wait()
+            refresh = False  # whatever that fetch stored is as fresh as it gets
+
+    def begin(self, url, refresh=False):
+        """Claim the fetch of ``url``, for callers that cannot block in get_or_fetch.
+
+        Returns (fresh cached result, None) when there is one, (None, event)
+        while another fetch of ``url`` is in progress (wait for the event and
+        call begin() again, without ``refresh``), or (None, None) when the
+        caller now owns the fetch and must hand its outcome to finish().
+        """
+        with self._lock:
+            if not refresh:
+                cached = self._fresh(url)
+                if cached:
+                    return cached, None
+            done = self._inflight.get(url)
+            if done is not None:
+                return None, done
+            self._inflight[url] = threading.Event()
+            return None, None
+
+    def finish(self, url, result=None):
+        """Store the result of a fetch claimed with begin() (None if it was abandoned) and wake its waiters."""
+        if result is not None:
+            self.put(url, result)
+        with self._lock:
+            done = self._inflight.pop(url)
+        done.set()
+
+    def _fresh(self, url):
+        entry = self._results.get(url)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._results[url]
+            return None
+        return result.as_cached()
+
+
+result_cache = ResultCache()
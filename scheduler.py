@@ -0,0 +1,180 @@
+"""Per-event adaptive polling and scan prioritization.
+
+Each event is re-checked on its own cadence: often when the show is close or
+its price moved recently, rarely when it is months away and nothing on the
+page has changed for a while. The same cadence orders the jobs of a single
+scan, so a scan cut short by its budget has covered the events that matter
+most, and several venues take turns in one shared worker pool.
+"""
+import heapq
+from datetime import datetime, timedelta
+from itertools import chain, zip_longest
+
+from dates import extract_date_from_url
+from records import price_observations
+
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 24 * 60 * 60
+TBD_INTERVAL = 6 * 60 * 60
+
+# (days until the event, base interval in seconds), first match wins
+PROXIMITY_INTERVALS = [
+    (1, 10 * 60),
+    (3, 30 * 60),
+    (7, 60 * 60),
+    (30, 4 * 60 * 60),
+]
+FAR_INTERVAL = 12 * 60 * 60
+
+
+def parse_timestamp(value):
+    """Parse the 'YYYY-mm-dd HH:MM:SS' timestamps stored in the history."""
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+
+def last_price_change(entry):
+    """Time of the most recent price change in a history entry, or None.
+
+    Prices are compared in cents, so '$20' and '$20.00' are the same price.
+    """
+    observations = price_observations(entry)
+    for newer, older in zip(reversed(observations), reversed(observations[:-1])):
+        if newer.price_cents != older.price_cents:
+            return parse_timestamp(newer.observed_at)
+    return None
+
+
+def recently_sold_out(entry, now):
+    """True if the event had a price on sale within the last three days but is no longer on sale."""
+    price_history = (entry or {}).get('price_history') or []
+    if not price_history or entry.get('on_sale', True):
+        return False
+    return now - parse_timestamp(price_history[-1]['date']) < timedelta(days=3)
+
+
+def poll_interval(event_date, entry, now=None):
+    """Seconds to wait before checking an event again."""
+    now = now or datetime.now()
+    if event_date is None:
+        interval = TBD_INTERVAL
+    else:
+        days_until = (event_date - now.date()).days
+        interval = next((seconds for days, seconds in PROXIMITY_INTERVALS if days_until <= days), FAR_INTERVAL)
+    changed_at = last_price_change(entry)
+    if (changed_at and now - changed_at < timedelta(days=1)) or recently_sold_out(entry, now):
+        interval /= 4
+    elif changed_at and now - changed_at < timedelta(days=7):
+        interval /= 2
+    elif entry and entry.get('last_checked') and len(entry.get('price_history') or []) > 1:
+        stable_since = changed_at or parse_timestamp(entry['price_history'][0]['date'])
+        if now - stable_since > timedelta(days=7):
+            # Checked repeatedly and stable for over a week
+            interval *= 2
+    return max(MIN_INTERVAL, min(MAX_INTERVAL, interval))
+
+
+def scan_priority(url, entry, now=None):
+    """Heap key for a scan job; smaller keys are checked first.
+
+    Events never checked come first, then the ones most overdue relative to
+    their own poll interval (so the date and volatility weigh in through
+    poll_interval), with the sooner show winning ties.
+    """
+    now = now or datetime.now()
+    event_date = extract_date_from_url(url)
+    if entry and entry.get('last_checked'):
+        elapsed = (now - parse_timestamp(entry['last_checked'])).total_seconds()
+        overdue = elapsed / poll_interval(event_date, entry, now)
+    else:
+        overdue = float('inf')
+    days_until = (event_date - now.date()).days if event_date else float('inf')
+    return -overdue, days_until
+
+
+def prioritize(urls, history, now=None):
+    """Return ``urls`` in the order a budgeted scan should check them."""
+    now = now or datetime.now()
+    queue = [(scan_priority(url, history.get(url), now), index, url) for index, url in enumerate(urls)]
+    heapq.heapify(queue)
+    return [heapq.heappop(queue)[2] for _ in range(len(queue))]
+
+
+def round_robin(queues):
+    """Interleave several ordered job lists one job at a time.
+
+    Used to share one worker pool between venues: each venue keeps its own
+    priority order, but a venue with hundreds of events cannot hold back the
+    others or use up a scan budget by itself.
+    """
+    skip = object()
+    return [job for job in chain.from_iterable(zip_longest(*queues, fillvalue=skip)) if job is not skip]
+
+
+def fair_order(urls_by_venue, history, now=None):
+    """Prioritize each venue's events, then interleave the venues round-robin."""
+    now = now or datetime.now()
+    return round_robin([prioritize(urls, history, now) for urls in urls_by_venue.values()])
+
+
+class PollScheduler:
+    """Min-heap of events keyed on when each is next due for a check."""
+
+    def __init__(self, history):
+        self.history = history
+        self._heap = []
+        self._due_at = {}
+
+    def __len__(self):
+        return len(self._due_at)
+
+    def update(self, urls, now=None):
+        """Track exactly ``urls``; new events are scheduled from their history."""
+        now = now or datetime.now()
+        urls = set(urls)
+        for url in list(self._due_at):
+            if url not in urls:
+                del self._due_at[url]
+        for url in urls - set(self._due_at):
+            entry = self.history.get(url)
+            if entry and entry.get('last_checked'):
+                due_at = parse_timestamp(entry['last_checked']) + timedelta(
+                    seconds=poll_interval(extract_date_from_url(url), entry, now))
+            else:
+                due_at = now
+            self._push(url, due_at)
+
+    def reschedule(self, url, now=None):
+        """Schedule the next check of ``url`` after it has just been checked."""
+        now = now or datetime.now()
+        if url in self._due_at:
+            interval = poll_interval(extract_date_from_url(url), self.history.get(url), now)
+            self._push(url, now + timedelta(seconds=interval))
+
+    def requeue(self, url, now=None):
+        """Put back a popped event that was not checked, due again right away."""
+        if url in self._due_at:
+            self._push(url, now or datetime.now())
+
+    def pop_due(self, now=None):
+        """Remove and return the events due at ``now``, most overdue first.
+
+        Every returned URL stays tracked and must be passed to reschedule()
+        once it has been checked, or to requeue() if it was not.
+        """
+        now = now or datetime.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, url = heapq.heappop(self._heap)
+            if self._due_at.get(url) == due_at:
+                due.append(url)
+        return due
+
+    def next_due(self):
+        """When the next event is due, or None if nothing is scheduled."""
+        while self._heap and self._due_at.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)  # stale entry for a rescheduled or dropped event
+        return self._heap[0][0] if self._heap else None
+
+    def _push(self, url, due_at):
+        self._due_at[url] = due_at
+        heapq.heappush(self._heap, (due_at, url))
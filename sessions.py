@@ -0,0 +1,133 @@
+"""Process-wide pool of reusable cloudscraper sessions.
+
+Streamlit re-executes app.py on every interaction, so anything that has to live
+for the whole process is kept in an imported module like this one.
+"""
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import cloudscraper
+
+
+def create_scraper():
+    """Create a cloudscraper session with the browser profile the app uses."""
+    return cloudscraper.create_scraper(
+        browser={'browser': 'chrome', 'platform': 'windows', 'desktop': True},
+        ssl_context=ssl._create_unverified_context()
+    )
+
+
+class _PooledSession:
+    __slots__ = ('session', 'created', 'failures', 'discarded')
+
+    def __init__(self, session):
+        self.session = session
+        self.created = time.monotonic()
+        self.failures = 0
+        self.discarded = False
+
+
+class SessionPool:
+    """Thread-safe pool of cloudscraper sessions keyed by host.
+
+    Sessions are checked out for the duration of a request and handed back
+    afterwards, so their keep-alive connections and Cloudflare clearance
+    cookies are reused by the next request to the same host. A session is
+    evicted once it fails ``max_failures`` times in a row, is explicitly
+    discarded, or is older than ``max_age`` seconds.
+    """
+
+    def __init__(self, max_per_host=16, max_failures=2, max_age=1800):
+        self.max_per_host = max_per_host
+        self.max_failures = max_failures
+        self.max_age = max_age
+        self._cond = threading.Condition()
+        self._idle = {}       # host -> [_PooledSession]
+        self._in_use = {}     # host -> number of checked out sessions
+        self._identity = {}   # host -> (user agent, cookie jar) shared by new sessions
+
+    @contextmanager
+    def session(self, url):
+        """Check out a session for ``url``'s host and return it to the pool afterwards."""
+        host = urlsplit(url).netloc.lower()
+        pooled = self._checkout(host)
+        try:
+            yield pooled.session
+        except Exception:
+            pooled.failures += 1
+            raise
+        else:
+            pooled.failures = 0
+        finally:
+            self._checkin(host, pooled)
+
+    def discard(self, session):
+        """Mark a checked out session so it is evicted instead of reused."""
+        session._pool_discard = True
+
+    def close(self):
+        """Close every idle session and forget the shared host identities."""
+        with self._cond:
+            idle, self._idle = self._idle, {}
+            self._identity.clear()
+        for sessions in idle.values():
+            for pooled in sessions:
+                pooled.session.close()
+
+    def _checkout(self, host):
+        with self._cond:
+            while True:
+                idle = self._idle.get(host, [])
+                while idle:
+                    pooled = idle.pop()
+                    if self._healthy(pooled):
+                        self._in_use[host] = self._in_use.get(host, 0) + 1
+                        return pooled
+                    pooled.session.close()
+                if self._in_use.get(host, 0) < self.max_per_host:
+                    self._in_use[host] = self._in_use.get(host, 0) + 1
+                    break
+                self._cond.wait()
+            identity = self._identity.get(host)
+        try:
+            session = create_scraper()
+        except Exception:
+            with self._cond:
+                self._in_use[host] -= 1
+                self._cond.notify()
+            raise
+        if identity:
+            # Clearance cookies are bound to the user agent that solved the challenge
+            user_agent, cookies = identity
+            session.headers['User-Agent'] = user_agent
+            session.cookies.update(cookies)
+        return _PooledSession(session)
+
+    def _checkin(self, host, pooled):
+        session = pooled.session
+        if getattr(session, '_pool_discard', False):
+            pooled.discarded = True
+        with self._cond:
+            self._in_use[host] -= 1
+            if pooled.discarded:
+                # Whatever this session was sent back with is not worth sharing
+                self._identity.pop(host, None)
+            if self._healthy(pooled):
+                if pooled.failures == 0:
+                    self._identity[host] = (session.headers.get('User-Agent'), session.cookies.copy())
+                self._idle.setdefault(host, []).append(pooled)
+                pooled = None
+            self._cond.notify()
+        if pooled is not None:
+            session.close()
+
+    def _healthy(self, pooled):
+        return (not pooled.discarded
+                and pooled.failures < self.max_failures
+                and time.monotonic() - pooled.created < self.max_age)
+
+
+session_pool = SessionPool()
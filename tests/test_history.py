@@ -0,0 +1,240 @@
+"""Behavior of the history stores across restarts, crashes and migrations."""
+import json
+import sqlite3
+
+import pytest
+
+from history import SCHEMA_VERSION, HistoryStore, SqliteHistoryStore, check_record
+from pricehistory import PriceHistory
+from records import CheckResult, EventStatus, PriceObservation
+
+URL = 'https://thehandlebar850.com/hb-events/soul-revue-12-01-26/'
+OTHER_URL = 'https://thehandlebar850.com/hb-events/bluegrass-12-02-26/'
+
+V1_SCHEMA = """
+    CREATE TABLE events (
+        url TEXT PRIMARY KEY,
+        event_name TEXT,
+        last_checked TEXT,
+        on_sale INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE price_observations (
+        url TEXT NOT NULL,
+        observed_at TEXT NOT NULL,
+        price TEXT NOT NULL
+    );
+    CREATE INDEX idx_price_observations_url_time ON price_observations (url, observed_at);
+    PRAGMA user_version = 1;
+"""
+
+
+def on_sale(checked_at, cents, url=URL):
+    return CheckResult(url, "Soul Revue", cents, EventStatus.ON_SALE, checked_at)
+
+
+def sold_out(checked_at, url=URL):
+    return CheckResult(url, "Soul Revue", None, EventStatus.NO_TICKETS, checked_at)
+
+
+def log_line(result):
+    return json.dumps(check_record(result)) + '\n'
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {
+        'snapshot_path': str(tmp_path / 'event_history.json'),
+        'log_path': str(tmp_path / 'event_history.jsonl'),
+        'db_path': str(tmp_path / 'event_history.db'),
+    }
+
+
+def jsonl_store(paths, **kwargs):
+    return HistoryStore(paths['snapshot_path'], paths['log_path'], **kwargs)
+
+
+def sqlite_store(paths):
+    return SqliteHistoryStore(paths['db_path'], paths['snapshot_path'], paths['log_path'])
+
+
+def write_snapshot(paths, history):
+    with open(paths['snapshot_path'], 'w', encoding='utf-8') as f:
+        json.dump(history, f)
+
+
+def write_log(paths, text):
+    with open(paths['log_path'], 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def observations(store, url=URL):
+    return [(observation.observed_at, observation.price_cents) for observation in store.price_history(url)]
+
+
+@pytest.fixture(params=['jsonl', 'sqlite'])
+def open_store(request, paths):
+    return lambda: jsonl_store(paths) if request.param == 'jsonl' else sqlite_store(paths)
+
+
+def test_records_survive_reopening(open_store):
+    store = open_store()
+    store.record(on_sale('2025-06-01 10:00:00', 2000))
+    store.record(on_sale('2025-06-01 11:00:00', 2500))
+    store.record(sold_out('2025-06-01 12:00:00'))
+    store.close()
+
+    store = open_store()
+    assert observations(store) == [('2025-06-01 10:00:00', 2000), ('2025-06-01 11:00:00', 2500)]
+    entry = store.get(URL)
+    assert entry['last_checked'] == '2025-06-01 12:00:00'
+    assert entry['on_sale'] is False
+    assert entry['price_history'][1] == {'date': '2025-06-01 11:00:00', 'price': '$25.00'}
+    store.close()
+
+
+def test_results_served_from_the_result_cache_are_not_recorded_again(open_store):
+    store = open_store()
+    result = on_sale('2025-06-01 10:00:00', 2000)
+    store.record(result)
+    store.record(result.as_cached())
+    assert observations(store) == [('2025-06-01 10:00:00', 2000)]
+    store.close()
+
+
+def test_checks_in_a_repeated_local_hour_are_kept(open_store):
+    # The clocks went back at 02:00: 01:10 comes again after 01:50
+    store = open_store()
+    store.record(on_sale('2025-11-02 01:50:00', 2000))
+    store.record(on_sale('2025-11-02 01:10:00', 2500))
+    store.close()
+
+    store = open_store()
+    assert sorted(observations(store)) == [('2025-11-02 01:10:00', 2500), ('2025-11-02 01:50:00', 2000)]
+    assert store.get(URL)['last_checked'] == '2025-11-02 01:10:00'
+    store.close()
+
+
+def test_price_rows_are_in_cents(open_store):
+    store = open_store()
+    store.record(on_sale('2025-06-01 10:00:00', 123450))
+    store.record(on_sale('2025-06-01 10:00:00', 1500, url=OTHER_URL))
+    assert store.price_rows() == [(OTHER_URL, '2025-06-01 10:00:00', 1500),
+                                  (URL, '2025-06-01 10:00:00', 123450)]
+    assert len(PriceHistory.from_store(store)) == 2
+    store.close()
+
+
+def test_jsonl_ignores_a_torn_last_line(paths):
+    write_log(paths, log_line(on_sale('2025-06-01 10:00:00', 2000)) + log_line(on_sale('2025-06-01 11:00:00', 2500))[:40])
+
+    store = jsonl_store(paths)
+    assert observations(store) == [('2025-06-01 10:00:00', 2000)]
+    store.record(on_sale('2025-06-01 12:00:00', 3000))
+    store.close()
+
+    store = jsonl_store(paths)
+    assert observations(store) == [('2025-06-01 10:00:00', 2000), ('2025-06-01 12:00:00', 3000)]
+    store.close()
+
+
+def test_jsonl_compacts_into_the_snapshot(paths):
+    store = jsonl_store(paths, compact_every=2)
+    store.record(on_sale('2025-06-01 10:00:00', 2000))
+    store.record(on_sale('2025-06-01 11:00:00', 2500))
+    store.record(on_sale('2025-06-01 12:00:00', 3000))
+    store.close()
+
+    with open(paths['snapshot_path'], encoding='utf-8') as f:
+        assert len(json.load(f)[URL]['price_history']) == 2
+    with open(paths['log_path'], encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+    store = jsonl_store(paths)
+    assert len(observations(store)) == 3
+    store.close()
+
+
+def test_jsonl_crash_between_snapshot_rename_and_log_truncate(paths):
+    store = jsonl_store(paths, compact_every=2)
+    store.record(on_sale('2025-06-01 10:00:00', 2000))
+    store.record(sold_out('2025-06-01 10:30:00'))
+    with open(paths['log_path'], encoding='utf-8') as f:
+        folded_log = f.read()
+    store.record(on_sale('2025-06-01 11:00:00', 2500))
+    store.record(on_sale('2025-06-01 12:00:00', 3000))  # compacts
+    store.close()
+    # The log as it was before the compaction that the crash interrupted
+    write_log(paths, folded_log + log_line(on_sale('2025-06-01 11:00:00', 2500)) +
+              log_line(on_sale('2025-06-01 12:00:00', 3000)))
+
+    store = jsonl_store(paths)
+    assert observations(store) == [('2025-06-01 10:00:00', 2000), ('2025-06-01 11:00:00', 2500),
+                                   ('2025-06-01 12:00:00', 3000)]
+    assert store.get(URL)['last_checked'] == '2025-06-01 12:00:00'
+    assert store.get(URL)['on_sale'] is True
+    store.close()
+
+
+def test_jsonl_crash_before_snapshot_rename(paths, tmp_path):
+    store = jsonl_store(paths)
+    store.record(on_sale('2025-06-01 10:00:00', 2000))
+    store.close()
+    (tmp_path / 'leftover.tmp').write_text('{"half": ')  # the snapshot being written
+
+    store = jsonl_store(paths)
+    assert observations(store) == [('2025-06-01 10:00:00', 2000)]
+    store.close()
+
+
+def test_sqlite_imports_json_history_once(paths):
+    write_snapshot(paths, {URL: {
+        'event_name': "Soul Revue",
+        'last_checked': '2025-06-01 10:00:00',
+        'on_sale': True,
+        'price_history': [{'date': '2025-06-01 09:00:00', 'price': '$20.00'},
+                          {'date': '2025-06-01 10:00:00', 'price': '$1,234.50'}]
+    }})
+    write_log(paths, log_line(on_sale('2025-06-01 10:00:00', 123450))     # already in the snapshot
+              + log_line(on_sale('2025-06-01 11:00:00', 2500, url=OTHER_URL))
+              + log_line(sold_out('2025-06-01 12:00:00'))
+              + '{"url": "torn')
+
+    store = sqlite_store(paths)
+    assert observations(store) == [('2025-06-01 09:00:00', 2000), ('2025-06-01 10:00:00', 123450)]
+    assert observations(store, OTHER_URL) == [('2025-06-01 11:00:00', 2500)]
+    entry = store.get(URL)
+    assert entry['last_checked'] == '2025-06-01 12:00:00'
+    assert entry['on_sale'] is False
+    assert entry['price_history'][1]['price'] == '$1,234.50'
+    store.record(on_sale('2025-06-01 13:00:00', 3000))
+    store.close()
+
+    store = sqlite_store(paths)  # the JSON history is not imported again
+    assert len(observations(store)) == 3
+    assert store._conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    store.close()
+
+
+def test_sqlite_upgrades_version_1_databases(paths):
+    conn = sqlite3.connect(paths['db_path'])
+    conn.executescript(V1_SCHEMA)
+    conn.execute("INSERT INTO events VALUES (?, 'Soul Revue', '2025-06-01 11:00:00', 1)", (URL,))
+    conn.executemany('INSERT INTO price_observations VALUES (?, ?, ?)',
+                     [(URL, '2025-06-01 09:00:00', '$20'),
+                      (URL, '2025-06-01 10:00:00', '$1,234.50'),
+                      (URL, '2025-06-01 11:00:00', 'Free')])
+    conn.commit()
+    conn.close()
+
+    store = sqlite_store(paths)
+    assert store._conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert store.price_history(URL) == [PriceObservation('2025-06-01 09:00:00', 2000),
+                                        PriceObservation('2025-06-01 10:00:00', 123450),
+                                        PriceObservation('2025-06-01 11:00:00', None)]
+    assert store.get(URL)['price_history'][0] == {'date': '2025-06-01 09:00:00', 'price': '$20'}
+    store.record(on_sale('2025-06-01 12:00:00', 3000))
+    assert PriceHistory.from_store(store).summary().loc[URL, 'observations'] == 3  # 'Free' has no price
+    store.close()
+
+    store = sqlite_store(paths)
+    assert observations(store)[-1] == ('2025-06-01 12:00:00', 3000)
+    store.close()
@@ -0,0 +1,532 @@
+"""Event scanning pipeline shared by the Streamlit app and the headless CLI.
+
+Nothing in here depends on Streamlit: listing discovery (fetch_links), event
+checks (stream_events/stream_events_async, which yield results as they
+arrive) and recording results in the history store.
+"""
+import asyncio
+import logging
+import os
+import queue
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import urllib3
+
+from catalog import EventCatalog, name_from_url
+from dates import extract_date_from_url, match_date
+from discovery import discovery, fetch_parsed
+from httpcache import http_cache
+from parsepool import parse_pool
+from parsing import extract_event_info, extractors, parse_event_bytes, parse_listing, record_parse_stats
+from ratelimit import HostBlockedError, RateLimitedError, rate_limiter
+from records import CheckResult, EventRecord
+from resultcache import result_cache
+from sessions import session_pool
+from venues import venue_for_url
+
+log = logging.getLogger('event_monitor')
+
+# Disable SSL verification warnings
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+MAX_WORKERS = 4
+MAX_RETRIES = 2
+ASYNC_CONCURRENCY = 16
+PARSE_PROCESSES = os.cpu_count() or 1
+MAX_LISTING_PAGES = 10
+LISTING_PAGE_RE = re.compile(r'/page/\d+/?(?:$|[?#])|[?&](?:paged|page|pg)=\d+'
+                             r'|/(?:hb-)?events?/(?:category|categories|tag|list|upcoming)(?:/|$)'
+                             r'|/(?:hb-)?events?-(?:category|categories)/')
+TRACKING_PARAM_PREFIXES = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', '_ga')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+DISCOVER_FEEDS = True
+
+
+def fetch_event_page(url):
+    """Download an event page using a pooled session.
+
+    Callers must take a rate limiter slot first; the response is fed back to
+    the limiter, which raises RateLimitedError for throttled responses.
+    """
+    with session_pool.session(url) as session:
+        response = session.get(url, timeout=25, verify=False,
+                               headers=http_cache.conditional_headers(url, extractors.for_url(url).signature))
+        if response.status_code in (403, 503):
+            # Blocked or challenged again; start the next request with a clean session
+            session_pool.discard(session)
+    rate_limiter.feedback(url, response)
+    return response
+
+
+def is_retryable(error):
+    """Only connection problems and throttling are worth another attempt."""
+    if isinstance(error, HostBlockedError):
+        return False  # blocked for longer than we are willing to wait
+    if isinstance(error, RateLimitedError):
+        return True
+    return 'connection' in str(error).lower() or 'remote' in str(error).lower()
+
+
+def download_event_page(url, retry_count=0):
+    """First stage of an event check: fetch the page, retrying connection problems.
+
+    Returns (result, None, None) when that already settles the check (an
+    unchanged page answered from the HTTP cache, or an error result), else
+    (None, response, body hash) with the response still to be parsed.
+    """
+    try:
+        rate_limiter.acquire(url)
+        response = fetch_event_page(url)
+        info, body_hash = http_cache.lookup(url, response, extractors.for_url(url).signature)
+        if info is not None:
+            return CheckResult.from_info(url, info), None, None
+        return None, response, body_hash
+    except Exception as e:
+        # Retry logic for connection errors
+        if retry_count < MAX_RETRIES and is_retryable(e):
+            if not isinstance(e, RateLimitedError):
+                rate_limiter.penalize(url)
+            return download_event_page(url, retry_count + 1)
+        return CheckResult.failed(url), None, None
+
+
+def parsed_result(url, response, body_hash, info):
+    """Cache a fresh parse of ``response`` and build its check result."""
+    http_cache.store(url, response, info, body_hash, extractors.for_url(url).signature)
+    return CheckResult.from_info(url, info)
+
+
+def fetch_event_status(url, retry_count=0):
+    """Check a single event for ticket availability and pricing with retry logic."""
+    result, response, body_hash = download_event_page(url, retry_count)
+    if result is not None:
+        return result
+    try:
+        info = extract_event_info(response.text, extractor=extractors.for_url(url))
+    except Exception:
+        return CheckResult.failed(url)
+    return parsed_result(url, response, body_hash, info)
+
+
+class ScanBudget:
+    """Optional limit on how long a scan may run and how many checks it may start."""
+
+    def __init__(self, seconds=None, requests=None):
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.requests = requests
+        self.started = 0
+
+    def take(self):
+        """Claim a check; False once the time or request budget is used up."""
+        if self.requests is not None and self.started >= self.requests:
+            return False
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return False
+        self.started += 1
+        return True
+
+
+SKIPPED = {'skipped': True}
+
+
+def iter_checks(urls, max_workers=MAX_WORKERS, budget=None, refresh=False):
+    """Check events on a bounded worker pool, yielding (index, result) as each check completes.
+
+    Checks are started in ``urls`` order, so callers that want the most
+    important events checked first should pass them prioritized. ``urls``
+    can be any iterable: it is only read as workers free up, and nothing but
+    the checks in flight is held, however many events there are. Once
+    ``budget`` is exhausted no further checks are started and the remaining
+    events are yielded as SKIPPED. Events checked within the result cache's
+    TTL are answered from it without using the budget or a worker, unless
+    ``refresh`` is set. Nothing is recorded in the history.
+    """
+    budget = budget or ScanBudget()
+    jobs = enumerate(urls)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+
+        def submit_next():
+            """Start the next check, yielding the events settled without one on the way."""
+            for index, url in jobs:
+                cached = None if refresh else result_cache.get(url)
+                if cached:
+                    yield index, cached
+                elif budget.take():
+                    pending[executor.submit(result_cache.get_or_fetch, url, fetch_event_status, refresh)] = index
+                    return
+                else:
+                    yield index, SKIPPED
+
+        for _ in range(max_workers):
+            yield from submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                yield from submit_next()  # keep the worker busy while the caller handles this result
+                yield index, future.result()
+
+
+def iter_checks_pipelined(urls, max_workers=MAX_WORKERS, parse_processes=PARSE_PROCESSES, budget=None,
+                          refresh=False):
+    """iter_checks with downloading and parsing split into two stages.
+
+    ``max_workers`` threads only download pages; the bytes go to a pool of
+    ``parse_processes`` processes (borrowed from parse_pool) that decode and
+    extract them, so parsing is not serialized on the GIL and scales with
+    the cores. A download of a page another scan is already checking waits
+    for that check and shares its result, as in iter_checks. Both stages
+    update the HTTP and result caches themselves and report back to this
+    generator through one queue, which records the parse counters.
+    """
+    budget = budget or ScanBudget()
+    jobs = enumerate(urls)
+    stage_queue = queue.Queue()
+
+    def download(index, url, parse_executor):
+        shared = result_cache.claim(url, refresh)
+        if shared:
+            stage_queue.put(('done', index, url, shared))
+            return
+        try:
+            result, response, body_hash = download_event_page(url)
+            if result is None:
+                future = parse_executor.submit(parse_event_bytes, response.content, response.encoding,
+                                               extractors.for_url(url))
+                stage_queue.put(('downloaded', index, url, None))
+                future.add_done_callback(lambda parsed: finish_parse(index, url, response, body_hash, parsed))
+                return
+        except Exception:
+            result = CheckResult.failed(url)
+        result_cache.finish(url, result)
+        stage_queue.put(('done', index, url, result))
+
+    def finish_parse(index, url, response, body_hash, future):
+        keys = ()
+        try:
+            info, keys = future.result()
+            result = parsed_result(url, response, body_hash, info)
+        except Exception:
+            result = CheckResult.failed(url)
+        result_cache.finish(url, result)
+        stage_queue.put(('parsed', index, url, (result, keys)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as io_executor, \
+            parse_pool.use(parse_processes) as parse_executor:
+        downloading = parsing = 0
+
+        def start_next():
+            nonlocal downloading
+            for index, url in jobs:
+                cached = None if refresh else result_cache.get(url)
+                if cached:
+                    yield index, cached
+                elif budget.take():
+                    io_executor.submit(download, index, url, parse_executor)
+                    downloading += 1
+                    return
+                else:
+                    yield index, SKIPPED
+
+        for _ in range(max_workers):
+            yield from start_next()
+        while downloading or parsing:
+            stage, index, url, payload = stage_queue.get()
+            if stage == 'downloaded':
+                downloading -= 1
+                parsing += 1
+                yield from start_next()
+                continue
+            if stage == 'parsed':
+                parsing -= 1
+                result, keys = payload
+                record_parse_stats(keys)
+            else:
+                downloading -= 1
+                result = payload
+                yield from start_next()
+            yield index, result
+
+
+def stream_events(urls, event_history, max_workers=MAX_WORKERS, parse_processes=0, budget=None, refresh=False):
+    """Check events and yield each result as soon as it is ready.
+
+    Results come in completion order and are recorded in the history as they
+    are yielded; events skipped by the budget are left out. Nothing is
+    collected, so memory stays flat however many events ``urls`` (any
+    iterable) produces. Pages are parsed on a pool of
+    ``parse_processes`` processes when that is set.
+    """
+    if parse_processes:
+        checks = iter_checks_pipelined(urls, max_workers, parse_processes, budget, refresh)
+    else:
+        checks = iter_checks(urls, max_workers, budget, refresh)
+    for _, result in checks:
+        if result is SKIPPED:
+            continue
+        if not result.error:
+            event_history.record(result)
+        yield result
+
+
+async def fetch_event_status_async(url, semaphore, io_executor, parse_executor):
+    """Async counterpart of fetch_event_status.
+
+    Only the blocking cloudscraper request and the HTML parse run on
+    executors; waiting for a rate-limit slot or a free fetch slot is done by the
+    event loop, so pending pages do not tie up threads. The rate-limit wait
+    happens before a fetch slot is taken, so a throttled host cannot hold
+    the slots other hosts' fetches need.
+    """
+    loop = asyncio.get_running_loop()
+    for retry_count in range(MAX_RETRIES + 1):
+        try:
+            await asyncio.sleep(rate_limiter.reserve(url))
+            async with semaphore:
+                response = await loop.run_in_executor(io_executor, fetch_event_page, url)
+            info, body_hash = http_cache.lookup(url, response, extractors.for_url(url).signature)
+            if info is None:
+                info, keys = await loop.run_in_executor(parse_executor, parse_event_bytes, response.content,
+                                                        response.encoding, extractors.for_url(url))
+                record_parse_stats(keys)
+                return parsed_result(url, response, body_hash, info)
+            return CheckResult.from_info(url, info)
+        except Exception as e:
+            if retry_count < MAX_RETRIES and is_retryable(e):
+                if not isinstance(e, RateLimitedError):
+                    rate_limiter.penalize(url)
+                continue
+            return CheckResult.failed(url)
+
+
+async def fetch_cached_async(url, semaphore, io_executor, parse_executor, refresh=False):
+    """fetch_event_status_async through the result cache, sharing a fetch already in progress."""
+    loop = asyncio.get_running_loop()
+    while True:
+        cached, done = result_cache.begin(url, refresh)
+        if cached:
+            return cached
+        if done is None:
+            break
+        await loop.run_in_executor(None, done.wait)
+        refresh = False  # whatever that fetch stored is as fresh as it gets
+    result = None
+    try:
+        result = await fetch_event_status_async(url, semaphore, io_executor, parse_executor)
+        return result
+    finally:
+        result_cache.finish(url, result)
+
+
+async def iter_checks_async(urls, concurrency=ASYNC_CONCURRENCY, budget=None, refresh=False, parse_processes=0):
+    """Check events on the asyncio pipeline, yielding (index, result) as each check completes.
+
+    Events are started in ``urls`` order, keeping up to twice ``concurrency``
+    in progress so parsing overlaps with the next fetches; the budget is
+    claimed as each one starts, and fresh cached results and fetches already
+    in progress are shared, like iter_checks. Pages are parsed on two threads, or on the shared pool of
+    ``parse_processes`` processes when that is set.
+    """
+    budget = budget or ScanBudget()
+    semaphore = asyncio.Semaphore(concurrency)
+    jobs = enumerate(urls)
+    pending = set()
+
+    async def run(index, url):
+        return index, await fetch_cached_async(url, semaphore, io_executor, parse_executor, refresh)
+
+    def start_next():
+        for index, url in jobs:
+            cached = None if refresh else result_cache.get(url)
+            if cached:
+                yield index, cached
+            elif budget.take():
+                pending.add(asyncio.ensure_future(run(index, url)))
+                return
+            else:
+                yield index, SKIPPED
+
+    with ThreadPoolExecutor(max_workers=concurrency) as io_executor, \
+            (parse_pool.use(parse_processes) if parse_processes else
+             ThreadPoolExecutor(max_workers=2)) as parse_executor:
+        try:
+            for _ in range(concurrency * 2):
+                for settled in start_next():
+                    yield settled
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    for settled in start_next():
+                        yield settled
+                    yield task.result()
+        finally:
+            # The caller stopped early: do not leave checks running without an event loop to finish them
+            for task in pending:
+                task.cancel()
+
+
+async def stream_events_async(urls, event_history, concurrency=ASYNC_CONCURRENCY, budget=None, refresh=False,
+                              parse_processes=0):
+    """Async counterpart of stream_events: yield each result as soon as it is ready."""
+    async for _, result in iter_checks_async(urls, concurrency, budget, refresh, parse_processes):
+        if result is SKIPPED:
+            continue
+        if not result.error:
+            event_history.record(result)
+        yield result
+
+
+def canonical_url(url):
+    """Normalize a URL for de-duplication: case, default port, fragment, tracking params, trailing slash."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and DEFAULT_PORTS.get(scheme) != parts.port:
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not key.lower().startswith(TRACKING_PARAM_PREFIXES)))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def extract_listing(html, page_url):
+    """Split a listing page's links into event page candidates and further listing pages.
+
+    Event candidates are links with a mm-dd-yy date; which of them are events
+    is up to the venue's link rules, so the cached parse does not depend on
+    them. Listing pages are pagination links (``/page/2/``, ``?paged=2``) and
+    event category/list views on the same host.
+    """
+    event_urls = []
+    listing_urls = []
+    found_links = set()
+    host = urlsplit(page_url).netloc.lower()
+    for href in parse_listing(html).hrefs():
+        if not href or href in found_links:
+            continue
+        found_links.add(href)
+        if match_date(href).kind == 'dash':
+            event_urls.append(urljoin(page_url, href))
+        elif LISTING_PAGE_RE.search(href):
+            full_url = urljoin(page_url, href)
+            if urlsplit(full_url).netloc.lower() == host:
+                listing_urls.append(full_url)
+    return {'events': event_urls, 'pages': listing_urls}
+
+
+def fetch_listing_page(url):
+    """Fetch and parse one listing page, reusing the cached parse when it is unchanged."""
+    listing = fetch_parsed(url, lambda response: extract_listing(response.text, url))
+    return listing or {'events': [], 'pages': []}
+
+
+def discover_event_urls(venue):
+    """[(url, lastmod)] of ``venue``'s events from its site's sitemaps or feeds, or None."""
+    discovered = discovery.discover(venue.events_url)
+    if not discovered:
+        return None
+    host = urlsplit(venue.events_url).netloc.lower()
+    event_urls = [(url, lastmod) for url, lastmod in discovered
+                  if urlsplit(url).netloc.lower() == host and venue.is_event_link(url)]
+    return event_urls or None
+
+
+def fetch_links(events_url, max_pages=MAX_LISTING_PAGES, horizon_days=None, discover=DISCOVER_FEEDS, venue=None):
+    """Fetch event links from the site's feeds, or the events page and the listing pages it links to.
+
+    With ``discover``, event URLs are taken from the site's sitemaps, REST API
+    or RSS feed when it has any (see discovery.py) and the HTML is not crawled.
+    Otherwise pagination and category pages are crawled breadth-first, each level
+    fetched concurrently, up to ``max_pages`` pages in total. Event URLs are
+    de-duplicated by canonical URL and past events are skipped. With
+    ``horizon_days``, events further out are skipped too and a page whose
+    latest event is beyond the horizon is not followed any further.
+
+    Event links are recognized by ``venue``'s link filter and skip patterns
+    (default: the Handlebar's rules). Returns an EventCatalog of the events.
+    """
+    venue = venue or venue_for_url(events_url)
+    today = date.today()
+    horizon = today + timedelta(days=horizon_days) if horizon_days is not None else None
+    catalog = EventCatalog()
+    seen_events = set()
+
+    def add_events(event_urls, source='listing'):
+        """Catalog the new, upcoming events of [(url, lastmod)]; return the latest event date seen."""
+        latest = None
+        for full_url, updated in event_urls:
+            if not venue.is_event_link(full_url):
+                continue
+            key = canonical_url(full_url)
+            if key in seen_events:
+                continue
+            seen_events.add(key)
+            event_date = extract_date_from_url(full_url)
+            if event_date:
+                latest = max(latest or event_date, event_date)
+            if event_date and event_date < today:
+                continue  # Skip past events
+            if horizon and event_date and event_date > horizon:
+                continue
+            catalog.add(EventRecord(full_url, event_date, venue.name, name_from_url(full_url), source, updated))
+        return latest
+
+    discovered = discover_event_urls(venue) if discover else None
+    if discovered:
+        add_events(discovered, 'feed')
+        return catalog
+
+    seen_pages = {canonical_url(events_url)}
+    frontier = [events_url]
+    fetched = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        while frontier and fetched < max_pages:
+            batch, frontier = frontier[:max_pages - fetched], []
+            futures = [executor.submit(fetch_listing_page, page_url) for page_url in batch]
+            for page_url, future in zip(batch, futures):
+                try:
+                    listing = future.result()
+                except Exception as e:
+                    if fetched == 0:
+                        raise  # the events page itself failed
+                    log.warning("Skipping listing page %s: %s", page_url, e)
+                    continue
+                latest = add_events((event_url, None) for event_url in listing['events'])
+                if horizon and latest and latest > horizon:
+                    continue  # later pages only go further out
+                for next_url in listing['pages']:
+                    key = canonical_url(next_url)
+                    if key not in seen_pages:
+                        seen_pages.add(key)
+                        frontier.append(next_url)
+            fetched += len(batch)
+    return catalog
+
+
+def fetch_venue_links(venues, max_pages=MAX_LISTING_PAGES, horizon_days=None, discover=DISCOVER_FEEDS):
+    """Fetch the event links of several venues concurrently into one EventCatalog.
+
+    Returns (catalog, {venue name: exception}) so one unreachable venue does
+    not hide the others. An event listed by several venues belongs to the
+    first of them.
+    """
+    catalog, errors = EventCatalog(), {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {venue.name: executor.submit(fetch_links, venue.events_url, max_pages, horizon_days, discover, venue)
+                   for venue in venues}
+        for name, future in futures.items():
+            try:
+                venue_catalog = future.result()
+            except Exception as e:
+                log.error("Fetching events for %s failed: %s", name, e)
+                errors[name] = e
+                continue
+            log.info("Found %d upcoming events for %s", len(venue_catalog), name)
+            catalog.update(venue_catalog)
+    return catalog, errors
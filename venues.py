@@ -0,0 +1,120 @@
+"""Venue registry: the listing pages to scan and how to recognize their event links.
+
+Venues are configured in ``venues.json`` as a list of objects::
+
+    [
+        {
+            "name": "The Handlebar",
+            "events_url": "https://thehandlebar850.com/events",
+            "link_filter": "hb-events",
+            "skip_patterns": ["contact", "about", "cart"]
+        }
+    ]
+
+``link_filter`` and ``skip_patterns`` are optional and default to the
+Handlebar's. Without a ``venues.json`` the Handlebar is the only venue.
+
+A venue can also name CSS ``ticket_selectors`` for the element of its event
+pages that holds a purchasable ticket and its price, and set
+``text_fallback`` to false when its pages never need the whole-page text
+search; loading the venue registers a site extractor for its host. The
+selectors can match any element, so such pages get a full parse tree unless
+the venue sets ``partial`` to true because its selectors only need the
+title, table rows and links that a partial parse keeps.
+"""
+import json
+import os
+from urllib.parse import urlsplit
+
+from dates import match_date
+from parsing import SelectorExtractor, extractors
+
+VENUES_PATH = 'venues.json'
+DEFAULT_EVENTS_URL = 'https://thehandlebar850.com/events'
+DEFAULT_LINK_FILTER = 'hb-events'
+# Common non-event pages
+DEFAULT_SKIP_PATTERNS = [
+    'contact', 'about', 'policy', 'terms',
+    'privacy', 'login', 'register', 'cart',
+    'checkout', 'account', 'admin'
+]
+
+
+class Venue:
+    """One venue's listing page and event-link rules."""
+
+    def __init__(self, name, events_url, link_filter=DEFAULT_LINK_FILTER, skip_patterns=None,
+                 ticket_selectors=None, text_fallback=True, partial=None):
+        self.name = name
+        self.events_url = events_url
+        self.link_filter = link_filter
+        self.skip_patterns = [pattern.lower() for pattern in
+                              (DEFAULT_SKIP_PATTERNS if skip_patterns is None else skip_patterns)]
+        self.ticket_selectors = ticket_selectors or []
+        self.text_fallback = text_fallback
+        self.partial = not self.ticket_selectors if partial is None else partial
+
+    def __repr__(self):
+        return f"Venue({self.name!r}, {self.events_url!r})"
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data.get('name') or not data.get('events_url'):
+            raise ValueError(f"Venue needs a name and an events_url: {data}")
+        return cls(data['name'], data['events_url'],
+                   data.get('link_filter', DEFAULT_LINK_FILTER), data.get('skip_patterns'),
+                   data.get('ticket_selectors'), data.get('text_fallback', True),
+                   data.get('partial'))
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'events_url': self.events_url,
+            'link_filter': self.link_filter,
+            'skip_patterns': self.skip_patterns,
+            'ticket_selectors': self.ticket_selectors,
+            'text_fallback': self.text_fallback,
+            'partial': self.partial
+        }
+
+    def register_extractor(self):
+        """Register this venue's ticket selectors for its host, if it has any."""
+        if self.ticket_selectors or not self.text_fallback:
+            extractor = SelectorExtractor(self.name, self.ticket_selectors, self.text_fallback,
+                                          self.partial)
+            extractors.register(extractor, urlsplit(self.events_url).hostname or '')
+
+    def is_event_link(self, href):
+        """True if ``href`` looks like one of this venue's event pages."""
+        if self.link_filter not in href:
+            return False
+        if any(pattern in href.lower() for pattern in self.skip_patterns):
+            return False
+        # Additional check - skip if URL doesn't look like an event
+        return match_date(href).kind == 'dash'
+
+
+DEFAULT_VENUE = Venue('The Handlebar', DEFAULT_EVENTS_URL)
+
+
+def load_venues(path=VENUES_PATH):
+    """The configured venues, or just the default one when ``path`` does not exist."""
+    if not os.path.exists(path):
+        return [DEFAULT_VENUE]
+    with open(path, 'r', encoding='utf-8') as f:
+        venues = [Venue.from_dict(data) for data in json.load(f)]
+    names = [venue.name for venue in venues]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate venue names in {path}: {', '.join(duplicates)}")
+    for venue in venues:
+        venue.register_extractor()
+    return venues
+
+
+def venue_for_url(events_url, venues=()):
+    """The registered venue for ``events_url``, or an ad-hoc one with the default link rules."""
+    for venue in venues:
+        if venue.events_url.rstrip('/') == events_url.rstrip('/'):
+            return venue
+    return Venue(urlsplit(events_url).netloc or events_url, events_url)